@@ -0,0 +1,423 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageChops, ImageDraw, ImageFont, ImageOps, ImageStat
+
+from modules import text_layout
+from modules.background_cache import BackgroundCache, load_fitted
+from modules.brightness_contrast_heatmap import find_best_text_region
+from modules.glow import draw_glow_text_block
+from modules.fake_api import APIConnectionError, APITimeoutError, FakeQuotaServer
+from modules.image_handler import (
+    draw_soft_glow_text, get_font_size, get_tiktok_safe_area, process_carousel, render_carousel
+)
+from modules.rate_limiter import CallScheduler
+from modules.slide_encoder import ENCODER_PRESETS, encode_slide
+
+FONT_PATH = "Montserrat-ExtraBold.ttf"
+SIZE = (1080, 1920)
+BASELINE_PATH = "benchmark_baseline.json"
+# Nothing in here should load just because a module was imported
+HEAVY_MODULES = ("openai", "googleapiclient", "httplib2", "requests", "ultralytics", "torch")
+CASES = ["glow", "layout", "fit", "encode", "heatmap", "carousel", "ratelimit", "startup"]
+LINES = [
+    "Be authentic and engage",
+    "with other content creators.",
+    "Dont just scroll. Stop and",
+    "engage, leave a comment",
+    "that boosts their confidence.",
+]
+LONG_TEXT = (
+    "Don't stress about what to post... There are tools out there that pick up on what your niche "
+    "is already talking about and sends you a daily idea. It's like having a content coach in your "
+    "back pocket. Even if your stuff feels small, it's part of something bigger. Keep supporting, "
+    "keep posting, keep showing up for the people who show up for you. It all compounds. "
+) * 2
+
+
+def fixture_slides(count=5):
+    """Slides from the first committed temp/carousel_* directory that has `count` of them."""
+    for folder in sorted(glob.glob("temp/carousel_*")):
+        paths = [os.path.join(folder, f"slide{i + 1}.jpg") for i in range(count)]
+        if all(os.path.exists(path) for path in paths):
+            return paths
+    return []
+
+
+def load_background():
+    paths = fixture_slides()
+    if paths:
+        img = ImageOps.fit(Image.open(paths[0]), SIZE, Image.Resampling.LANCZOS)
+        return img.convert("RGBA")
+    return Image.new("RGBA", SIZE, (40, 40, 40, 255))
+
+
+def placements(font, line_spacing=20):
+    line_height = font.getbbox("Ay")[3] - font.getbbox("Ay")[1]
+    y = 600
+    out = []
+    for line in LINES:
+        out.append(((120, y), line))
+        y += line_height + line_spacing
+    return out
+
+
+def render_old(base, font, lines, glow_radius, blur_radius):
+    img = base.copy()
+    for position, text in lines:
+        img = draw_soft_glow_text(img, position, text, font=font, fill="white",
+                                  glow_radius=glow_radius, blur_radius=blur_radius)
+    return img
+
+
+def render_new(base, font, lines, glow_radius, blur_radius):
+    return draw_glow_text_block(base.copy(), lines, font=font, fill="white",
+                                glow_radius=glow_radius, blur_radius=blur_radius)
+
+
+def layout_old(text, font_path, safe_box, font_size, min_font_size=60):
+    """The wrap-and-shrink loop process_carousel used before modules.text_layout."""
+    draw = ImageDraw.Draw(Image.new("RGBA", SIZE))
+    max_width = safe_box[2] - safe_box[0]
+    max_height = safe_box[3] - safe_box[1]
+    line_spacing = 10
+    while True:
+        font = ImageFont.truetype(font_path, font_size)
+        lines = []
+        current_line = ""
+        for word in text.split():
+            test_line = current_line + (" " if current_line else "") + word
+            bbox = draw.textbbox((0, 0), test_line, font=font)
+            if bbox[2] - bbox[0] <= max_width:
+                current_line = test_line
+            else:
+                lines.append(current_line)
+                current_line = word
+        if current_line:
+            lines.append(current_line)
+        line_height = font.getbbox("Ay")[3] - font.getbbox("Ay")[1]
+        total_height = len(lines) * (line_height + line_spacing)
+        if total_height <= max_height or font_size <= min_font_size:
+            return font_size, lines
+        font_size -= 2
+
+
+def find_best_text_region_old(image, avoid_boxes=[], box_size=(400, 300), stride=100):
+    """The crop-and-ImageStat loop test.py used before modules.brightness_contrast_heatmap."""
+    gray = image.convert("L")
+    width, height = image.size
+    best_score = float('inf')
+    best_box = (0, 0)
+    for y in range(0, height - box_size[1], stride):
+        for x in range(0, width - box_size[0], stride):
+            candidate_box = (x, y, x + box_size[0], y + box_size[1])
+            if any(not (candidate_box[2] < b[0] or candidate_box[0] > b[2] or
+                        candidate_box[3] < b[1] or candidate_box[1] > b[3]) for b in avoid_boxes):
+                continue
+            stat = ImageStat.Stat(gray.crop(candidate_box))
+            score = stat.stddev[0] + abs(stat.mean[0] - 128)
+            if score < best_score:
+                best_score = score
+                best_box = (x, y)
+    return best_box + (best_box[0] + box_size[0], best_box[1] + box_size[1])
+
+
+def best_of(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def max_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _measure_child(fn, repeat, conn):
+    before = max_rss_bytes()
+    seconds, _ = best_of(fn, repeat)
+    after = max_rss_bytes()
+    conn.send((seconds, None if before is None else after - before))
+    conn.close()
+
+
+def measure(fn, repeat):
+    """
+    Best-of-repeat seconds and peak memory growth in bytes. Peak is the RSS high-water mark of
+    a forked child (tracemalloc cannot see Pillow's pixel buffers), None where fork is unavailable.
+    """
+    if "fork" not in multiprocessing.get_all_start_methods():
+        seconds, _ = best_of(fn, repeat)
+        return seconds, None
+    context = multiprocessing.get_context("fork")
+    parent, child = context.Pipe(duplex=False)
+    process = context.Process(target=_measure_child, args=(fn, repeat, child))
+    process.start()
+    child.close()
+    result = parent.recv()
+    process.join()
+    return result
+
+
+def bench_glow(repeat, glow_radius=10, blur_radius=8):
+    font = ImageFont.truetype(FONT_PATH, 80)
+    base = load_background()
+    lines = placements(font)
+
+    old_img = render_old(base, font, lines, glow_radius, blur_radius)
+    new_img = render_new(base, font, lines, glow_radius, blur_radius)
+    diff = ImageChops.difference(old_img.convert("RGB"), new_img.convert("RGB")).convert("L")
+    histogram = diff.histogram()
+    mean_diff = sum(i * n for i, n in enumerate(histogram)) / (SIZE[0] * SIZE[1])
+    note = f"{len(lines)} lines, mean abs pixel diff {mean_diff:.3f}"
+
+    return [
+        ("glow.draw_soft_glow_text", lambda: render_old(base, font, lines, glow_radius, blur_radius), repeat, note),
+        ("glow.draw_glow_text_block", lambda: render_new(base, font, lines, glow_radius, blur_radius), repeat, note),
+    ]
+
+
+def bench_layout(repeat):
+    safe_box = get_tiktok_safe_area(*SIZE)
+    repeat = max(repeat, 5)
+    variants = []
+    for label, text in (("short", " ".join(LINES)), ("long", LONG_TEXT)):
+        size = max(120, get_font_size(len(text)))
+
+        def run_cold(text=text, size=size):
+            # cold cache each time, like a fresh process_carousel call
+            text_layout._metrics.clear()
+            return text_layout.fit_text(text, FONT_PATH, safe_box, start_size=size)
+
+        note = f"{len(text)} chars"
+        variants += [
+            (f"layout.old_loop.{label}", lambda text=text, size=size: layout_old(text, FONT_PATH, safe_box, size), repeat, note),
+            (f"layout.fit_text_cold.{label}", run_cold, repeat, note),
+            (f"layout.fit_text_warm.{label}",
+             lambda text=text, size=size: text_layout.fit_text(text, FONT_PATH, safe_box, start_size=size), repeat, note),
+        ]
+    return variants
+
+
+def bench_fit(repeat, workdir):
+    # A phone-camera sized JPEG made from a fixture slide
+    source = os.path.join(workdir, "camera.jpg")
+    load_background().convert("RGB").resize((3024, 5376), Image.Resampling.BICUBIC).save(source, quality=92)
+    cache = BackgroundCache(root=os.path.join(workdir, "backgrounds"))
+    cache.get(source, SIZE)
+    note = "3024x5376 JPEG -> 1080x1920"
+
+    def imageops_fit():
+        with Image.open(source) as img:
+            return ImageOps.fit(img, SIZE, Image.Resampling.LANCZOS).convert("RGBA")
+
+    return [
+        ("fit.imageops_fit", imageops_fit, repeat, note),
+        ("fit.draft_decode", lambda: load_fitted(source, SIZE), repeat, note),
+        ("fit.derivative_cache_hit", lambda: cache.get(source, SIZE), repeat, note),
+    ]
+
+
+def bench_encode(repeat):
+    font = ImageFont.truetype(FONT_PATH, 80)
+    slide = render_new(load_background(), font, placements(font), 10, 8).convert("RGB")
+    variants = []
+    for name, options in ENCODER_PRESETS.items():
+        size_kb = len(encode_slide(slide, name)) / 1024
+        note = f"{size_kb:.1f} KB {options}"
+        variants.append((f"encode.{name}", lambda name=name: encode_slide(slide, name), max(repeat, 3), note))
+    return variants
+
+
+def bench_heatmap(repeat):
+    img = load_background().convert("RGB")
+    avoid = [(100, 400, 500, 900)]
+    safe_box = get_tiktok_safe_area(*SIZE)
+    old = find_best_text_region_old(img, avoid)
+    new = find_best_text_region(img, avoid, stride=100, scale=1)
+    # The loop never tries the last offset, which the NumPy grid always includes
+    at_edge = new is not None and (new[2] == SIZE[0] or new[3] == SIZE[1])
+    if old == new:
+        note = "stride 100 regions match"
+    elif at_edge:
+        note = f"stride 100 region {new} on the edge offset the loop skips"
+    else:
+        note = f"stride 100 regions differ {old} vs {new}"
+    # place_in_calm_band's box is exactly as wide as the safe area, so every stride has to land on its left edge
+    band = (safe_box[2] - safe_box[0], 300)
+    strides = (4, 8, 10, 12, 16, 20, 24, 32)
+    missed = [s for s in strides if find_best_text_region(img, avoid, band, stride=s, allowed_box=safe_box) is None]
+    band_note = f"⚠️ no band at stride {', '.join(map(str, missed))}" if missed else f"band found at strides {strides[0]}-{strides[-1]}"
+    return [
+        ("heatmap.loop_stride100", lambda: find_best_text_region_old(img, avoid), repeat, note),
+        ("heatmap.numpy_stride100", lambda: find_best_text_region(img, avoid, stride=100, scale=1), repeat, note),
+        ("heatmap.numpy_stride8_auto",
+         lambda: find_best_text_region(img, avoid, stride=8, allowed_box=safe_box), max(repeat, 5), "render_slide settings"),
+        ("heatmap.numpy_band_stride8",
+         lambda: find_best_text_region(img, avoid, band, stride=8, allowed_box=safe_box), max(repeat, 5), band_note),
+    ]
+
+
+def bench_carousel(repeat, workdir):
+    import yaml
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+    paths = fixture_slides()
+    texts = LINES
+    colors = ["#FFFFFF"] * len(paths)
+    note = f"{len(paths)} fixture slides, serial, warm background cache"
+    runs = []
+
+    def to_disk():
+        output_dir = tempfile.mkdtemp(dir=workdir)
+        runs.append(output_dir)
+        return process_carousel("auto", paths, FONT_PATH, config, colors, texts, output_dir=output_dir)
+
+    def to_memory():
+        return render_carousel("auto", paths, FONT_PATH, config, colors, texts)
+
+    to_memory()  # warm the font registry and background cache
+    return [
+        ("carousel.process_carousel", to_disk, repeat, note),
+        ("carousel.render_carousel", to_memory, repeat, note),
+    ]
+
+
+def bench_ratelimit(repeat, calls=60, workers=6, quota=100):
+    """Threads hammering a fake API with a quota of `quota`/s, with the limiter guessing twice that."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def run(limits):
+        server = FakeQuotaServer(quota, burst=10, latency=0.005)
+        scheduler = CallScheduler(limits)
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(lambda _: scheduler.call("api", server.call, attempts=10, base_delay=0.05), range(calls)))
+        return server, scheduler
+
+    limited = {"api": {"rate": quota * 2, "burst": 10, "concurrency": workers}}
+    variants = []
+    for name, limits in (("retry_only", None), ("aimd_limiter", limited)):
+        server, scheduler = run(limits)
+        note = f"{calls} calls, {server.throttled} x 429, {scheduler.retries} retries"
+        if limits:
+            note += f", settled at {scheduler.limiter('api').rate:.0f}/s"
+        variants.append((f"ratelimit.{name}", lambda limits=limits: run(limits), repeat, note))
+
+    def connection_errors():
+        """openai-style connection errors and timeouts on the first two tries, then a success."""
+        errors = [APIConnectionError("connection reset"), APITimeoutError("timed out")]
+        scheduler = CallScheduler(sleep=lambda seconds: None)
+
+        def call():
+            if errors:
+                raise errors.pop(0)
+            return "ok"
+
+        try:
+            return scheduler.call("openai", call), scheduler.retries
+        except APIConnectionError as e:
+            return None, f"{type(e).__name__} raised"
+
+    result, retries = connection_errors()
+    note = f"retried {retries} openai connection errors" if result else f"⚠️ {retries}"
+    variants.append(("ratelimit.connection_errors", connection_errors, repeat, note))
+    return variants
+
+
+def bench_startup(repeat):
+    """Cold imports in a fresh interpreter, noting any heavy dependency that got loaded on the way."""
+    import subprocess
+    variants = []
+    for module in ("main", "modules.image_handler", "modules.llm"):
+        code = f"import sys, {module}; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        run = lambda code=code: subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+        loaded = run().stdout.strip()
+        note = f"⚠️ loads {loaded}" if loaded else "no heavy dependencies loaded"
+        variants.append((f"startup.import_{module.split('.')[-1]}", run, max(repeat, 3), note))
+    return variants
+
+
+def compare(results, baseline, tolerance):
+    """Print every result against the baseline, returning the names that got slower than tolerance allows."""
+    regressions = []
+    print(f"{'case':34} {'time':>10} {'peak':>9} {'vs baseline':>12}  notes")
+    for name, seconds, peak, note in results:
+        peak_text = f"{peak / 1024 ** 2:7.1f}MB" if peak is not None else "      n/a"
+        delta_text = ""
+        reference = baseline.get(name)
+        if reference:
+            delta = seconds / reference["seconds"] - 1
+            delta_text = f"{delta:+.0%}"
+            if delta > tolerance:
+                delta_text += " SLOWER"
+                regressions.append(name)
+        print(f"{name:34} {seconds * 1000:8.2f}ms {peak_text} {delta_text:>12}  {note}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the slide rendering hot paths")
+    parser.add_argument("cases", nargs="*", help=f"any of {', '.join(CASES)} (default: all)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--glow-radius", type=int, default=10)
+    parser.add_argument("--blur-radius", type=int, default=8)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write these results to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="slowdown allowed before a case counts as a regression")
+    parser.add_argument("--check", action="store_true", help="exit 1 when any case regressed")
+    args = parser.parse_args()
+    unknown = [case for case in args.cases if case not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s) {', '.join(unknown)}, choose from {', '.join(CASES)}")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        builders = {
+            "glow": lambda: bench_glow(args.repeat, args.glow_radius, args.blur_radius),
+            "layout": lambda: bench_layout(args.repeat),
+            "fit": lambda: bench_fit(args.repeat, workdir),
+            "encode": lambda: bench_encode(args.repeat),
+            "heatmap": lambda: bench_heatmap(args.repeat),
+            "carousel": lambda: bench_carousel(args.repeat, workdir),
+            "ratelimit": lambda: bench_ratelimit(args.repeat),
+            "startup": lambda: bench_startup(args.repeat),
+        }
+        for case in args.cases or CASES:
+            for name, fn, repeat, note in builders[case]():
+                seconds, peak = measure(fn, repeat)
+                results.append((name, seconds, peak, note))
+
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        baseline.update({
+            name: {"seconds": round(seconds, 6), "peak_bytes": peak}
+            for name, seconds, peak, _ in results
+        })
+        with open(args.baseline, "w") as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+        print(f"💾 Saved {len(results)} results to {args.baseline}")
+
+    if regressions:
+        print(f"⚠️ {len(regressions)} case(s) slower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
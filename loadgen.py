@@ -0,0 +1,166 @@
+import argparse
+import contextlib
+import csv
+import glob
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import yaml
+from PIL import Image, ImageDraw
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+FONT_PATH = os.path.join(REPO_DIR, "Montserrat-ExtraBold.ttf")
+PROMPT = "Rewrite this for a TikTok carousel slide, casual and punchy: {original}"
+WORDS = [
+    "post", "consistently", "engage", "creators", "comment", "niche", "content", "daily",
+    "authentic", "scroll", "confidence", "compounds", "supporting", "hobby", "tools", "showing up",
+]
+
+
+def background_sources():
+    """Committed temp/carousel_* slides, used as backgrounds before any synthetic ones."""
+    return sorted(glob.glob(os.path.join(REPO_DIR, "temp", "carousel_*", "*.jpg")))
+
+
+def synthetic_background(path, seed, size=(1080, 1920)):
+    rng = random.Random(seed)
+    img = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        w, h = rng.randrange(100, 600), rng.randrange(100, 600)
+        draw.rectangle((x, y, x + w, y + h), fill=tuple(rng.randrange(256) for _ in range(3)))
+    img.save(path, quality=90)
+
+
+def synthetic_rows(count, slides, seed):
+    rng = random.Random(seed)
+    return [
+        [
+            f"Row {i + 1} slide {j + 1}: " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+            for j in range(slides)
+        ]
+        for i in range(count)
+    ]
+
+
+def build_world(root, main, rows, images_per_folder, seed):
+    """Folder tree standing in for Drive and CSV sheets for LocalSheetsBackend, laid out for main's ids."""
+    drive_root = os.path.join(root, "drive")
+    sheets_root = os.path.join(root, "sheets")
+    sources = background_sources()
+    for j, folder_id in enumerate(main.FOLDER_IDS):
+        folder = os.path.join(drive_root, folder_id)
+        os.makedirs(folder, exist_ok=True)
+        for k in range(images_per_folder):
+            index = j * images_per_folder + k
+            path = os.path.join(folder, f"background{k + 1}.jpg")
+            if index < len(sources):
+                shutil.copyfile(sources[index], path)
+            else:
+                synthetic_background(path, seed + index)
+    fonts_folder = os.path.join(drive_root, main.FONTS_FOLDER_ID)
+    os.makedirs(fonts_folder, exist_ok=True)
+    shutil.copyfile(FONT_PATH, os.path.join(fonts_folder, os.path.basename(FONT_PATH)))
+    for folder_id in main.GDRIVE_TIKTOK_ACCOUNT_FOLDER_IDS.values():
+        os.makedirs(os.path.join(drive_root, folder_id), exist_ok=True)
+
+    sheet_dir = os.path.join(sheets_root, main.SPREADSHEET_ID)
+    os.makedirs(sheet_dir, exist_ok=True)
+    for sheet, values in (("Prompts", [["Prompt"], [PROMPT]]), ("Sheet1", [[f"Slide {j + 1}" for j in range(len(rows[0]))]] + rows)):
+        with open(os.path.join(sheet_dir, f"{sheet}.csv"), "w", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows(values)
+    return drive_root, sheets_root
+
+
+def write_config(root, drive_root, sheets_root, args):
+    with open(os.path.join(REPO_DIR, "config.yaml"), "r") as f:
+        config = yaml.safe_load(f)
+    faults = {
+        "drive": {"latency": args.latency, "error_rate": args.error_rate, "seed": args.seed},
+        "sheets": {"latency": args.latency, "error_rate": args.error_rate, "seed": args.seed + 1},
+        "openai": {"latency": args.llm_latency, "error_rate": args.error_rate, "seed": args.seed + 2},
+    }
+    config.update({
+        "local_drive_root": drive_root,
+        "local_sheets_root": sheets_root,
+        "llm_backend": "stub",
+        "fault_injection": faults,
+        "detect_phones": args.detect_phones,
+        "skip_unchanged_rows": False,
+    })
+    if args.render_processes:
+        config["render_processes"] = args.render_processes
+    path = os.path.join(root, "config.yaml")
+    with open(path, "w") as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+    return path
+
+
+def run(root, args):
+    sys.path.insert(0, REPO_DIR)
+    import main
+    from modules.profiler import StageProfiler
+    from modules.rate_limiter import get_scheduler
+    from modules.sheets_handler import SheetSnapshot, SheetState
+
+    rows = synthetic_rows(args.rows, len(main.FOLDER_IDS), args.seed)
+    drive_root, sheets_root = build_world(root, main, rows, args.images, args.seed)
+    config_path = write_config(root, drive_root, sheets_root, args)
+    # Caches, metrics and scratch dirs all land in root, so every run starts cold
+    os.chdir(root)
+    log_path = os.path.join(root, "loadgen.log")
+    print(f"🏭 {args.rows} rows x {main.NUM_VARIATIONS} variations, latency {args.latency}s (LLM {args.llm_latency}s), error rate {args.error_rate:.0%}")
+
+    with open(log_path, "w", encoding="utf-8") as log, contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+        main.init(config_path)
+        profiler = StageProfiler()
+        started = time.perf_counter()
+        snapshot = SheetSnapshot.load(main.sheets_backend, main.SPREADSHEET_ID, main.PROMPT_RANGE, main.DATA_RANGE)
+        font_path, catalog = main.load_assets(profiler)
+        render_pool = main.start_render_pool(font_path, profiler)
+        setup_seconds = time.perf_counter() - started
+        try:
+            pipeline = main.process_rows(snapshot, snapshot.rows, SheetState(), font_path, catalog, render_pool, profiler)
+        finally:
+            if render_pool is not None:
+                render_pool.close()
+        main.close_pools()
+        elapsed = time.perf_counter() - started - setup_seconds
+        main.write_run_metrics(pipeline, render_pool)
+        main.workspace.close()
+
+    uploads = pipeline.summary()["upload"]["processed"]
+    print(f"⏱️ setup {setup_seconds:.2f}s, pipeline {elapsed:.2f}s")
+    print(f"🚀 {len(rows) / elapsed:.2f} rows/s, {uploads / elapsed:.2f} carousels/s, {len(pipeline.errors)} errors")
+    for api, stats in get_scheduler().stats().items():
+        print(f"🚦 {api}: {stats['calls']} calls, {stats['throttled']} throttled, rate {stats['rate']}")
+    print(f"🔁 {get_scheduler().retries} retries" + (f", log in {log_path}" if args.workdir else ""))
+    return len(pipeline.errors)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run synthetic rows through main's pipeline on offline Drive, Sheets and LLM stand-ins")
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--images", type=int, default=8, help="background images per slide folder")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every Drive and Sheets call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds added to every LLM call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls failing with a retryable 503")
+    parser.add_argument("--render-processes", type=int, help="default: render_processes from config.yaml")
+    parser.add_argument("--detect-phones", action="store_true", help="run the YOLO phone detector too")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="keep the generated tree, caches and metrics here instead of a temp dir")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline output instead of writing it to loadgen.log")
+    args = parser.parse_args()
+
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        errors = run(os.path.abspath(args.workdir), args)
+    else:
+        with tempfile.TemporaryDirectory(prefix="carousel-loadgen-") as root:
+            errors = run(root, args)
+    sys.exit(1 if errors else 0)
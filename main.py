@@ -1,73 +1,105 @@
+import argparse
+import csv
 import os
-import io
+import signal
+import threading
 import time
 from datetime import datetime
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from googleapiclient.http import MediaIoBaseUpload
-from google.oauth2.service_account import Credentials
-from PIL import Image
-from modules.image_handler import process_carousel
-from modules.llm import generate_unique_variations
+from modules.image_handler import process_carousel, render_carousel
+from modules.llm import generate_unique_variations, generate_variation_grid, make_openai_client
+from modules.font_registry import get_registry
+from modules import google_clients
+from modules.drive_backend import make_drive_backend
+from modules.image_catalog import ImageCatalog
+from modules.download_cache import DownloadCache
+from modules.image_fetcher import fetch_images
+from modules.drive_handler import Uploader
+from modules.llm_cache import CachedOpenAI, get_llm_cache
+from modules.sheets_handler import SheetSnapshot, SheetState, make_sheets_backend
+from modules.pipeline import Pipeline, Stage
+from modules.render_pool import RenderPool
+from modules.phone_detector import get_detector
+from modules.background_cache import get_background_cache
+from modules.workspace import Workspace
+from modules.job_queue import JOB_KINDS, JOB_QUEUE_PATH, JobQueue
+from modules.profiler import PROFILE_DIR, PROFILE_MODES, StageProfiler
+from modules.rate_limiter import configure_scheduler, get_scheduler, scheduled_openai
+from modules.metrics import METRICS_DIR, Instrumented, configure_metrics, drive_transfer, instrument_openai
 import yaml
-import random
 from dotenv import load_dotenv
-import openai
-from openai import OpenAI
 import os
 from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
 
 NUM_VARIATIONS = 3
 NUM_DATA_ROWS = 10
 
 
-# Load config
-with open("config.yaml", "r") as f:
-    config = yaml.safe_load(f)
-# Load environment variables
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Shared config, clients and backends, built by init() rather than on import
+config = None
+metrics_dir = METRICS_DIR
+metrics = None
+client = None
+drive_backend = None
+sheets_backend = None
+uploader = None
+fetch_pool = None
+download_cache = None
+workspace = None
+
+def load_config(config_path="config.yaml"):
+    with open(config_path, "r") as f:
+        return yaml.safe_load(f)
+
+def init(config_path="config.yaml"):
+    """Load config and .env and build the clients the run shares. Only the first call does anything."""
+    global config, metrics_dir, metrics, client, drive_backend, sheets_backend, uploader, fetch_pool, download_cache, workspace
+    if config is not None:
+        return config
+    loaded = load_config(config_path)
+    # Load environment variables
+    load_dotenv()
+    # Counters and timings for the run, written to metrics_dir as JSON and Prometheus text at the end
+    metrics_dir = loaded.get("metrics_dir", METRICS_DIR)
+    metrics = configure_metrics(os.path.join(metrics_dir, "events.jsonl"))
+    # Token bucket, concurrency cap and 429 backoff per API, shared by every worker thread
+    configure_scheduler(loaded.get("rate_limits"))
+    # Completions are cached in cache/llm_cache.sqlite3, llm_cache_mode: read-through | refresh | bypass
+    # llm_backend: stub answers offline, like local_drive_root and local_sheets_root do for Google
+    client = CachedOpenAI(
+        scheduled_openai(instrument_openai(make_openai_client(loaded), metrics)),
+        get_llm_cache(),
+        mode=loaded.get("llm_cache_mode", "read-through")
+    )
+    drive_backend = Instrumented(make_drive_backend(loaded), "drive", metrics, measure=drive_transfer)
+    sheets_backend = Instrumented(make_sheets_backend(loaded), "sheets", metrics)
+    uploader = Uploader(drive_backend, max_workers=loaded.get("upload_workers", 8))
+    # Background downloads for every row share these threads and their per-thread Drive clients
+    fetch_pool = ThreadPoolExecutor(max_workers=loaded.get("fetch_workers", 8), thread_name_prefix="fetch")
+    download_cache = DownloadCache(drive_backend, max_bytes=loaded.get("download_cache_max_mb", 2048) * 1024 ** 2)
+    # Per-run scratch dirs, workspace_root can point at a tmpfs such as /dev/shm/carousels
+    workspace = Workspace(
+        loaded.get("workspace_root", os.path.join("temp", "workspaces")),
+        quota_bytes=loaded.get("workspace_quota_mb", 2048) * 1024 ** 2,
+        max_age_seconds=loaded.get("workspace_max_age_hours", 24) * 3600,
+        keep_finished=loaded.get("workspace_keep_finished", False)
+    )
+    config = loaded
+    return config
 
 def generate_variations(strings, num_variations, model="gpt-4", max_tokens=50, prompt_template=None):
-    variation_buckets = [[] for _ in range(num_variations)]
-
-    for original in strings:
-        generated = set()
-
-        while len(generated) < num_variations:
-#             prompt = f"""
-# You're a Gen Z TikTok creator speaking to young women aged 18–30.
-
-# Take this phrase: "{original}"
-
-# Your job is to rewrite it with the same meaning and emotional intensity, but in a clean, confident TikTok-native tone — not corporate, but not cringe.
-
-# Rules:
-# - Keep it short, punchy, and emotionally resonant.
-# - No fluff, no storytelling, no intros.
-# - Avoid forced slang like “babes” “slay” "yo", "sis" "vibe" "dope" "fam" "sick" or “vibes”.
-# - Should not be cringe to read by Gen Z or Millenials.
-# - Sound like a smart creator giving clear, helpful advice.
-# - No quotation marks or explanations — just return the new line.
-# """
-
-            final_prompt = prompt_template.replace("{original}", original)
-
-            response = client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": final_prompt}],
-                temperature=0.9,
-                max_tokens=max_tokens
-            )
-
-            variation = response.choices[0].message.content.strip().replace('"', '')
-            generated.add(variation)
-
-        # Assign variations to their respective buckets
-        for i, v in enumerate(list(generated)[:num_variations]):
-            variation_buckets[i].append(v)
-
-    return [strings] + variation_buckets
+    # One JSON request for every slide x variation, re-asking only for missing or
+    # duplicate cells before falling back to capped single requests
+    return generate_variation_grid(
+        strings,
+        num_variations,
+        prompt_template,
+        llm_client=client,
+        model=model,
+        max_tokens=max_tokens,
+        temperature=0.9,
+        max_batch_attempts=config.get("llm_batch_attempts", 3)
+    )
 
 
 # === CONFIGURE YOUR FOLDER IDS AND TEXTS HERE ===
@@ -94,35 +126,19 @@ GDRIVE_TIKTOK_ACCOUNT_FOLDER_IDS = {
     "CommentScout TikTok Account #4": "1ZIrLBAhn5bKcTw0J6tRWzBCSn9Zrgzw7"
 }
 
-def get_prompt_from_sheet(spreadsheet_id, range_name='Prompts!A2'):
-    SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
-    creds = Credentials.from_service_account_file('credentials.json', scopes=SCOPES)
-    service = build('sheets', 'v4', credentials=creds)
-
-    sheet = service.spreadsheets()
-    result = sheet.values().get(
-        spreadsheetId=spreadsheet_id,
-        range=range_name
-    ).execute()
+SPREADSHEET_ID = '1O6lNd7gIEnI_K8GxNFYSUj9WVKtveU1mwWIVgL0g7J8'
+PROMPT_RANGE = 'Prompts!A2'
+DATA_RANGE = 'Sheet1'
 
-    values = result.get('values', [])
+def get_prompt_from_sheet(spreadsheet_id, range_name=PROMPT_RANGE):
+    values = sheets_backend.batch_get(spreadsheet_id, [range_name])[0]
     if values and values[0]:
         return values[0][0]  # First cell
     else:
         raise ValueError("❌ Prompt cell is empty or missing.")
 
 def get_sheet_rows(spreadsheet_id, range_name):
-    SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
-    creds = Credentials.from_service_account_file('credentials.json', scopes=SCOPES)
-    service = build('sheets', 'v4', credentials=creds)
-
-    sheet = service.spreadsheets()
-    result = sheet.values().get(
-        spreadsheetId=spreadsheet_id,
-        range=range_name
-    ).execute()
-
-    values = result.get('values', [])
+    values = sheets_backend.batch_get(spreadsheet_id, [range_name])[0]
 
     # Return all rows except the header
     return values[1:] if values else []
@@ -145,239 +161,410 @@ FONTS_FOLDER_ID = "1mwenttTQ04TKdd0EMIfotO7CyucQDkuF"
 
 # === Google Drive Setup ===
 def get_drive_service():
-    SCOPES = ['https://www.googleapis.com/auth/drive']
-    creds = Credentials.from_service_account_file('credentials.json', scopes=SCOPES)
-    return build('drive', 'v3', credentials=creds)
+    # Built once per thread and reused, see modules/google_clients.py
+    return google_clients.drive()
 
 # === Fetch First Image from Folder ===
-def get_images_from_folder(folder_id, max_images=100):
-    drive_service = get_drive_service()
-    query = f"'{folder_id}' in parents and (mimeType contains 'image/')"
-    response = drive_service.files().list(
-        q=query,
-        spaces='drive',
-        fields='files(id, name, mimeType)',
-        pageSize=max_images,
-        supportsAllDrives=True
-    ).execute()
-    return response.get('files', [])
-
-# === Download File from Drive ===
-def download_image_from_drive(file_id, output_dir, index, is_font=False):
-    drive_service = get_drive_service()
-    try:
-        file_metadata = drive_service.files().get(fileId=file_id, fields='mimeType, name', supportsAllDrives=True).execute()
-        mime_type = file_metadata.get('mimeType')
-        file_name = file_metadata.get('name')
-
-        mime_to_ext = {
-            'image/jpeg': '.jpg',
-            'image/png': '.png',
-            'image/gif': '.gif',
-            'image/bmp': '.bmp',
-            'image/tiff': '.tiff',
-            'application/x-font-ttf': '.ttf',
-            'application/font-sfnt': '.ttf',
-            'application/vnd.google-apps.font': '.ttf',
-            'font/ttf': '.ttf',
-        }
-
-        if mime_type not in mime_to_ext:
-            print(f"File {file_id} is not a valid image/font (MIME: {mime_type})")
-            return None
-
-        ext = mime_to_ext[mime_type] if not is_font else '.ttf'
-        # output_path = os.path.join(output_dir, "font.ttf" if is_font else f"slide_{index+1}{ext}")
-        output_path = os.path.join(output_dir, "font.ttf" if is_font else f"raw_slide_{index+1}{ext}")
-
-
-        request = drive_service.files().get_media(fileId=file_id)
-        with io.FileIO(output_path, 'wb') as fh:
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-        time.sleep(0.2)
-
-        if is_font:
-            from PIL import ImageFont
-            ImageFont.truetype(output_path, 10)
+def get_images_from_folder(folder_id, max_images=None):
+    # Paginated listing, main() picks slides from the local ImageCatalog instead
+    images = drive_backend.list_files(folder_id)
+    return images[:max_images] if max_images else images
+
+# === Pick Slide Backgrounds ===
+def pick_slide_images(catalog):
+    picks = []
+    for j, folder_id in enumerate(FOLDER_IDS):
+        if folder_id and folder_id.strip():
+            img_file = catalog.pick(folder_id)
+            if not img_file:
+                print(f"❌ No image found in folder {folder_id}")
+            picks.append(img_file)
         else:
-            with Image.open(output_path) as img:
-                img.verify()
-        return output_path
+            print(f"⚠️ Empty folder ID for slide {j+1}")
+            picks.append(None)
+    return picks
 
+# === Detect Phones In Slide Backgrounds ===
+def detect_slide_phones(image_paths):
+    if not config.get("detect_phones", True):
+        return None
+    paths = [path for path in image_paths if path]
+    try:
+        detections = dict(zip(paths, get_detector().detect(paths)))
     except Exception as e:
-        print(f"❌ Error downloading file {file_id}: {e}")
+        print(f"⚠️ Phone detection failed, using fixed iPhone layout: {e}")
         return None
+    return [detections.get(path, []) if path else [] for path in image_paths]
 
 # === Download First TTF from Fonts Folder ===
-def download_first_font_from_folder(folder_id, output_dir):
-    drive_service = get_drive_service()
-    query = f"'{folder_id}' in parents and mimeType != 'application/vnd.google-apps.folder'"
-    response = drive_service.files().list(
-        q=query,
-        spaces='drive',
-        fields='files(id, name, mimeType)',
-        supportsAllDrives=True
-    ).execute()
-    for file in response.get('files', []):
-        if file['name'].lower().endswith('.ttf'):
-            return download_image_from_drive(file['id'], output_dir, 0, is_font=True)
-    print("⚠️ No TTF font found in folder")
-    return None
+def download_first_font_from_folder(folder_id):
+    # Fetched once per run and reused from cache/fonts across runs
+    return get_registry().fetch_from_folder(drive_backend, folder_id)
 
 def create_drive_folder(folder_name, parent_folder_id):
-    drive_service = get_drive_service()
-    folder_metadata = {
-        'name': folder_name,
-        'mimeType': 'application/vnd.google-apps.folder',
-        'parents': [parent_folder_id]
-    }
-
     try:
-        folder = drive_service.files().create(
-            body=folder_metadata,
-            fields='id, name',
-            supportsAllDrives=True
-        ).execute()
-        print(f"📁 Created Drive folder: {folder['name']} (ID: {folder['id']})")
-        return folder['id']
+        folder_id = drive_backend.create_folder(folder_name, parent_folder_id)
+        print(f"📁 Created Drive folder: {folder_name} (ID: {folder_id})")
+        return folder_id
     except Exception as e:
         print(f"❌ Failed to create folder: {e}")
         return None
 
 def upload_images_to_drive(folder_id, local_dir):
-    drive_service = get_drive_service()
-    uploaded_files = []
-
-    for filename in sorted(os.listdir(local_dir)):
-        if filename.lower().endswith((".jpg", ".jpeg", ".png")):
-            file_path = os.path.join(local_dir, filename)
-            file_metadata = {
-                "name": filename,
-                "parents": [folder_id]
+    # Queued on the shared upload pool, call .wait() on the manifest for the file ids
+    return uploader.submit_folder(folder_id, local_dir)
+
+def upload_slides_to_drive(folder_id, slides):
+    # In-memory (name, bytes) slides, same manifest as upload_images_to_drive
+    return uploader.submit_buffers(folder_id, slides)
+
+def build_pipeline(snapshot, sheet_state, font_path, catalog, test_texts, render_pool=None, profiler=None):
+    """
+    row intake -> variation generation -> asset fetch -> render -> upload, each stage with its
+    own worker count (pipeline_workers) and a bounded queue in front of it (pipeline_queue_size).
+    """
+    skip_unchanged = config.get("skip_unchanged_rows", True)
+    workers = config.get("pipeline_workers", {})
+    queue_size = config.get("pipeline_queue_size", 4)
+    in_memory = config.get("render_output", "disk") == "memory"
+    # Convert dict values to a list
+    folder_ids = list(GDRIVE_TIKTOK_ACCOUNT_FOLDER_IDS.values())
+
+    def intake(indexed_row):
+        index, row = indexed_row
+        if not row:  # skip empty rows
+            return None
+        row_hash = snapshot.row_hash(row)
+        if skip_unchanged and sheet_state.is_done(SPREADSHEET_ID, row_hash):
+            print(f"⏭️ Row {index + 1} unchanged since last run, skipping")
+            return None
+
+        SLIDE_TEXTS = []
+        for array in row:
+            slide_text = array.strip()  # get the first column
+            SLIDE_TEXTS.append(slide_text)
+        print(f"{SLIDE_TEXTS}")
+        return {"index": index, "row_hash": row_hash, "slide_texts": SLIDE_TEXTS}
+
+    def generate(job):
+        CAROUSELS = generate_variations(job["slide_texts"], NUM_VARIATIONS, "gpt-4", 100, snapshot.prompt)
+        test_texts.append(CAROUSELS)
+        if len(CAROUSELS) != NUM_VARIATIONS + 1:
+            raise RuntimeError(f"variations not complete for row {job['index'] + 1}")
+        return dict(job, carousels=CAROUSELS)
+
+    def fetch(job):
+        # Pick every variation's backgrounds up front and fetch the whole row at once
+        CAROUSELS = job["carousels"]
+        row_picks = [pick_slide_images(catalog) for _ in range(1, len(CAROUSELS))]
+        row_results = fetch_images(
+            download_cache,
+            [img_file for picks in row_picks for img_file in picks],
+            pool=fetch_pool
+        )
+        for result in row_results:
+            if not result.ok and result.file is not None:
+                print(f"❌ Error downloading file {result.file['id']}: {result.error}")
+
+        # One detector batch for the whole row, cached by image content
+        row_paths = [result.path for result in row_results]
+        row_boxes = detect_slide_phones(row_paths)
+
+        for i in range(1, len(CAROUSELS)):
+            start, end = (i - 1) * len(FOLDER_IDS), i * len(FOLDER_IDS)
+            yield {
+                "index": job["index"],
+                "row_hash": job["row_hash"],
+                "variation": i,
+                "slide_texts": CAROUSELS[i],
+                "image_paths": row_paths[start:end],
+                "phone_boxes": row_boxes[start:end] if row_boxes is not None else None,
+                # Slides without a background are dropped at render, so the carousel can't count as done
+                "fetch_errors": {k + 1: result.error for k, result in enumerate(row_results[start:end]) if not result.ok},
             }
-            media = MediaIoBaseUpload(io.FileIO(file_path, 'rb'), mimetype="image/jpeg")
-            try:
-                uploaded_file = drive_service.files().create(
-                    body=file_metadata,
-                    media_body=media,
-                    fields="id, name",
-                    supportsAllDrives=True  # ✅ Required for Shared Drives
-                ).execute()
-                uploaded_files.append(uploaded_file["id"])
-                print(f"📤 Uploaded {filename} to Drive folder {folder_id}")
-            except Exception as e:
-                print(f"❌ Failed to upload {filename}: {e}")
 
-    return uploaded_files
+    def missing_slides(names):
+        names = set(names)
+        return [k + 1 for k in range(len(FOLDER_IDS)) if f"slide{k + 1}.jpg" not in names]
+
+    def render(carousel):
+        print(f"Variation: {carousel['variation'] + 1}")
+        # "memory" hands encoded slides straight to the uploader, "disk" writes temp/carousel_<ts>/
+        args = (LAYOUT, carousel["image_paths"], font_path, config, FONT_COLORS, carousel["slide_texts"])
+        if in_memory:
+            slides = render_carousel(*args, render_pool=render_pool, phone_boxes=carousel["phone_boxes"])
+            metrics.incr("slides_rendered_total", len(slides))
+            metrics.incr("bytes_total", sum(len(data) for _, data in slides), api="render", direction="encoded")
+            return dict(carousel, slides=slides, missing_slides=missing_slides(name for name, _ in slides))
+
+        output_dir = workspace.allocate(f"row{carousel['index'] + 1}_v{carousel['variation'] + 1}")
+        try:
+            process_carousel(*args, render_pool=render_pool, phone_boxes=carousel["phone_boxes"], output_dir=output_dir)
+            rendered = os.listdir(output_dir)
+            metrics.incr("slides_rendered_total", len(rendered))
+        except Exception:
+            workspace.release(output_dir)
+            raise
+        return dict(carousel, output_dir=output_dir, missing_slides=missing_slides(rendered))
+
+    def upload(carousel):
+        i = carousel["variation"]
+        # Microseconds so carousels uploaded in the same second get their own folders
+        timestamp = datetime.now().strftime("%Y-%m-%d %H.%M.%S.%f")
+        subfolder_name = f"carousel-{timestamp}"
+
+        # Access value by index, e.g., index 2
+        parent_folder_id = folder_ids[i]
+        try:
+            destination_folder_id = create_drive_folder(subfolder_name, parent_folder_id)
+            if destination_folder_id is None:
+                raise RuntimeError(f"no Drive folder for row {carousel['index'] + 1} variation {i + 1}")
+
+            if "slides" in carousel:
+                manifest = upload_slides_to_drive(destination_folder_id, carousel["slides"])
+            else:
+                manifest = upload_images_to_drive(destination_folder_id, carousel["output_dir"])
+            file_ids = manifest.wait()
+        finally:
+            # Rendered files are done with once uploaded, or once the upload has failed
+            if "output_dir" in carousel:
+                workspace.release(carousel["output_dir"])
+        for name, error in manifest.errors().items():
+            print(f"❌ Failed to upload {name}: {error}")
+        uploaded = sum(1 for f in file_ids if f)
+        print(f"✅ Uploaded {uploaded}/{len(file_ids)} slides to folder {manifest.folder_id}")
+        # Done only with every slide fetched, rendered and uploaded, else the row is retried next run
+        complete = not carousel["fetch_errors"] and not carousel["missing_slides"] and uploaded == len(FOLDER_IDS)
+        if not complete:
+            print(f"⚠️ Row {carousel['index'] + 1} variation {i + 1} incomplete: {uploaded}/{len(FOLDER_IDS)} slides uploaded, "
+                  f"fetch errors {carousel['fetch_errors'] or 'none'}, not rendered {carousel['missing_slides'] or 'none'}")
+        # Drop the encoded slides so finished carousels don't pile up in memory
+        carousel = {key: value for key, value in carousel.items() if key != "slides"}
+        return dict(carousel, file_ids=file_ids, upload_ok=complete and not manifest.errors())
+
+    # Only stages named in --profile are wrapped, the rest run their functions as is
+    profiler = profiler or StageProfiler()
+    return Pipeline([
+        Stage("intake", profiler.wrap("intake", intake), workers=1, queue_size=queue_size),
+        Stage("generate", profiler.wrap("generate", generate), workers=workers.get("generate", 2), queue_size=queue_size),
+        Stage("fetch", profiler.wrap("fetch", fetch), workers=workers.get("fetch", 2), queue_size=queue_size, fan_out=True),
+        Stage("render", profiler.wrap("render", render), workers=workers.get("render", 1), queue_size=queue_size),
+        Stage("upload", profiler.wrap("upload", upload), workers=workers.get("upload", 4), queue_size=queue_size),
+    ], metrics=metrics)
+
+def write_run_metrics(pipeline, render_pool=None):
+    metrics.record_cache("download", download_cache.stats())
+    metrics.record_cache("llm", get_llm_cache().stats())
+    if render_pool is None:
+        # With a pool the background cache lives in the worker processes
+        metrics.record_cache("background", get_background_cache().stats())
+    for name, stats in pipeline.summary().items():
+        metrics.gauge("stage_busy_seconds", stats["busy_seconds"], stage=name)
+        metrics.gauge("stage_workers", stats["workers"], stage=name)
+    for name, value in workspace.stats().items():
+        metrics.gauge(f"workspace_{name}", value)
+    for api, stats in get_scheduler().stats().items():
+        metrics.gauge("api_rate_limit", stats["rate"] or 0, api=api)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    summary_path = os.path.join(metrics_dir, f"run_{timestamp}.json")
+    metrics.event("run_finished", summary=summary_path, errors=len(pipeline.errors))
+    metrics.write_json(summary_path)
+    metrics.write_prometheus(os.path.join(metrics_dir, "carousel_generator.prom"))
+    print(f"📊 Metrics written to {summary_path}")
+
+def close_pools():
+    """Wait for queued uploads and downloads, then stop the shared upload and fetch threads."""
+    uploader.close()
+    fetch_pool.shutdown(wait=True)
+
+def load_assets(profiler):
+    """Font and background catalog, fetched once per run, or once for the daemon's lifetime."""
+    with metrics.timer("setup_seconds", step="font"), profiler.section("font"):
+        font_path = download_first_font_from_folder(FONTS_FOLDER_ID)
+    with metrics.timer("setup_seconds", step="catalog"), profiler.section("catalog"):
+        catalog = ImageCatalog(drive_backend)
+        catalog.sync(FOLDER_IDS)
+    return font_path, catalog
+
+def start_render_pool(font_path, profiler):
+    # Slides render on a process pool when render_processes > 1, started before any pipeline thread
+    render_processes = config.get("render_processes", 1)
+    render_pool = RenderPool(font_path, config, render_processes) if render_processes > 1 else None
+    if render_pool is not None and profiler.enabled("render"):
+        print("⚠️ Slides render in worker processes, set render_processes: 1 to profile inside process_carousel")
+    return render_pool
+
+def process_rows(snapshot, rows, sheet_state, font_path, catalog, render_pool=None, profiler=None):
+    """Run rows through the pipeline and mark the ones that fully uploaded as done. Returns the Pipeline."""
+    test_texts = []
+    pipeline = build_pipeline(snapshot, sheet_state, font_path, catalog, test_texts, render_pool, profiler)
+    # for index, row in enumerate(sheet_rows):
+    carousels = pipeline.run(enumerate(rows))
+
+    # Rows only count as done once every variation rendered and uploaded
+    failed_rows = {error.item["row_hash"] for error in pipeline.errors if isinstance(error.item, dict) and "row_hash" in error.item}
+    uploaded = {}
+    for carousel in carousels:
+        uploaded.setdefault(carousel["row_hash"], []).append(carousel["upload_ok"])
+    for row_hash, results in uploaded.items():
+        if row_hash not in failed_rows and len(results) == NUM_VARIATIONS and all(results):
+            sheet_state.mark_done(SPREADSHEET_ID, row_hash)
+    sheet_state.save()
 
-def main():
+    print(test_texts)
+    for name, stats in pipeline.summary().items():
+        print(f"⏱️ {name}: {stats['processed']} done, {stats['failed']} failed, {stats['busy_seconds']}s busy across {stats['workers']} workers")
+    return pipeline
 
-    test_texts = []
+def print_cache_stats():
+    cache_stats = download_cache.stats()
+    print(f"🗄️ Download cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%})")
+    llm_stats = get_llm_cache().stats()
+    print(f"🧠 LLM cache: {llm_stats['hits']} hits, {llm_stats['misses']} misses ({llm_stats['hit_rate']:.0%}), {llm_stats['tokens_saved']} tokens saved")
 
-    sheet_id = '1O6lNd7gIEnI_K8GxNFYSUj9WVKtveU1mwWIVgL0g7J8'
-    sheet_rows = get_sheet_rows(sheet_id, 'Sheet1')
+def main(profiler=None):
+    init()
 
+    profiler = profiler or StageProfiler()
+    profiler.start()
+    metrics.event("run_started", spreadsheet_id=SPREADSHEET_ID, layout=LAYOUT, num_variations=NUM_VARIATIONS)
 
-    # Skip header row
-    data_rows = sheet_rows[1:]
+    # Prompt and rows in one batchGet, held for the whole run
+    with metrics.timer("setup_seconds", step="sheet"):
+        snapshot = SheetSnapshot.load(sheets_backend, SPREADSHEET_ID, PROMPT_RANGE, DATA_RANGE)
+    sheet_state = SheetState()
 
-    # for index, row in enumerate(sheet_rows):
-    for index, row in enumerate(sheet_rows[:NUM_DATA_ROWS]):
-        if row:  # skip empty rows
-
-             # Continue with rest of the script...
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            temp_dir = f"temp/carousel_{timestamp}"
-            os.makedirs(temp_dir, exist_ok=True)
-            raw_dir = os.path.join("temp", "raw")
-            os.makedirs(raw_dir, exist_ok=True)
-            font_path = download_first_font_from_folder(FONTS_FOLDER_ID, temp_dir)
-
-
-            
-
-            SLIDE_TEXTS = []
-            for array in row:
-                slide_text = array.strip()  # get the first column
-                SLIDE_TEXTS.append(slide_text)
-            print(f"{SLIDE_TEXTS}")
-
-            # CAROUSELS = generate_variations(SLIDE_TEXTS, 3)
-            
-
-            sheet_id = '1O6lNd7gIEnI_K8GxNFYSUj9WVKtveU1mwWIVgL0g7J8'
-            prompt_template = get_prompt_from_sheet(sheet_id)
-            CAROUSELS = generate_variations(SLIDE_TEXTS, NUM_VARIATIONS, "gpt-4", 100, prompt_template)
-            # print(prompt_template)
-            # print(CAROUSELS)
-
-            # exit()
-            # sheet_rows = get_sheet_rows(sheet_id, 'Sheet1')
-            # data_rows = sheet_rows[1:]
-
-            test_texts.append(CAROUSELS)
-            if len(CAROUSELS) != NUM_VARIATIONS + 1:
-                print(f"variations not complete")
-                exit()
-
-            for i in range(1, len(CAROUSELS)):
-                local_image_paths = []
-
-                print(f"Variation: {i + 1}")
-          
-                slide_texts = CAROUSELS[i]
-
-                timestamp = datetime.now().strftime("%Y-%m-%d %H.%M.%S")
-                subfolder_name = f"carousel-{timestamp}"
-                # Convert dict values to a list
-                folder_ids = list(GDRIVE_TIKTOK_ACCOUNT_FOLDER_IDS.values())
-
-                # Access value by index, e.g., index 2
-                parent_folder_id = folder_ids[i]
-
-               
-
-                for j, folder_id in enumerate(FOLDER_IDS):
-                    print(f"Folder: {j + 1}")
-
-
-                    if folder_id and folder_id.strip():
-                        images = get_images_from_folder(folder_id.strip(), max_images=100)
-                        if images:
-                            img_file = random.choice(images)
-                            img_path = download_image_from_drive(img_file['id'], raw_dir, j)
-                            local_image_paths.append(img_path)
-                        else:
-                            print(f"❌ No image found in folder {folder_id}")
-                            local_image_paths.append(None)
-                    else:
-                        print(f"⚠️ Empty folder ID for slide {j+1}")
-                        local_image_paths.append(None)
-
-                # try:
-                destination_folder_id = create_drive_folder(subfolder_name, parent_folder_id)
-                output_dir = process_carousel(
-                    LAYOUT,
-                    local_image_paths,
-                    font_path,
-                    config,
-                    FONT_COLORS,
-                    slide_texts
-                )
-                upload_images_to_drive(destination_folder_id, output_dir)
-                print(f"✅ Uploading Image: {j+1} to folder: {i+1}")
-
-                # except Exception as e:
-                #     print(f"❌ Error processing carousel: {e}")
-    print(test_texts)
+    # Scratch dirs of runs that crashed before cleaning up
+    workspace.sweep()
+
+    font_path, catalog = load_assets(profiler)
+    render_pool = start_render_pool(font_path, profiler)
+    try:
+        pipeline = process_rows(snapshot, snapshot.rows[:NUM_DATA_ROWS], sheet_state, font_path, catalog, render_pool, profiler)
+    finally:
+        if render_pool is not None:
+            render_pool.close()
+        profiler.stop()
+    close_pools()
+
+    print_cache_stats()
+    write_run_metrics(pipeline, render_pool)
+
+# === Daemon Mode ===
+def job_rows(job, snapshot):
+    """(snapshot, rows) for a queued job. "rows" jobs reuse the last prompt read unless they bring their own."""
+    payload = job["payload"]
+    if job["kind"] == "sheet" or (snapshot is None and not payload.get("prompt")):
+        with metrics.timer("setup_seconds", step="sheet"):
+            snapshot = SheetSnapshot.load(sheets_backend, SPREADSHEET_ID, PROMPT_RANGE, DATA_RANGE)
+    if job["kind"] == "sheet":
+        return snapshot, snapshot.rows[:payload.get("limit", NUM_DATA_ROWS)]
+    prompt = payload.get("prompt") or snapshot.prompt
+    return SheetSnapshot(SPREADSHEET_ID, prompt, []), payload.get("rows", [])
+
+def run_daemon(queue, profiler=None):
+    """
+    Serve jobs from queue until SIGINT/SIGTERM. The clients, font, image catalog, phone
+    detector, caches and render pool are set up once and stay warm between jobs.
+    """
+    init()
+    profiler = profiler or StageProfiler()
+    profiler.start()
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    started = time.perf_counter()
+    workspace.sweep()
+    font_path, catalog = load_assets(profiler)
+    catalog_synced = time.monotonic()
+    if config.get("detect_phones", True):
+        try:
+            get_detector().model()
+        except Exception as e:
+            print(f"⚠️ Phone detector failed to load, jobs will retry it: {e}")
+    render_pool = start_render_pool(font_path, profiler)
+    sheet_state = SheetState()
+    snapshot = None
+    requeued = queue.requeue_stale()
+    poll_seconds = config.get("daemon_poll_seconds", 0.2)
+    catalog_refresh = config.get("daemon_catalog_refresh_seconds", 300)
+    print(f"👂 Daemon ready in {time.perf_counter() - started:.1f}s, waiting for jobs in {queue.path} ({requeued} requeued)")
+
+    try:
+        while not stop.is_set():
+            job = queue.claim()
+            if job is None:
+                stop.wait(poll_seconds)
+                continue
+            print(f"📥 Job {job['id']} ({job['kind']})")
+            metrics.observe("job_wait_seconds", time.time() - job["submitted_at"], kind=job["kind"])
+            try:
+                with metrics.timer("job_seconds", kind=job["kind"]):
+                    snapshot, rows = job_rows(job, snapshot)
+                    if job["kind"] == "sheet" or time.monotonic() - catalog_synced > catalog_refresh:
+                        with profiler.section("catalog"):
+                            catalog.sync(FOLDER_IDS)
+                        catalog_synced = time.monotonic()
+                    pipeline = process_rows(snapshot, rows, sheet_state, font_path, catalog, render_pool, profiler)
+            except Exception as e:
+                print(f"❌ Job {job['id']} failed: {e}")
+                metrics.incr("jobs_total", kind=job["kind"], status="failed")
+                queue.fail(job["id"], e)
+                continue
+            metrics.incr("jobs_total", kind=job["kind"], status="done")
+            queue.complete(job["id"], {"rows": len(rows), "errors": len(pipeline.errors)})
+            print(f"✅ Job {job['id']} done: {len(rows)} rows, {len(pipeline.errors)} errors")
+            write_run_metrics(pipeline, render_pool)
+    finally:
+        print("🛑 Daemon stopping")
+        if render_pool is not None:
+            render_pool.close()
+        profiler.stop()
+        close_pools()
+        queue.close()
+
+def read_rows_file(path):
+    """Rows for a "rows" job from a CSV file, one row per carousel and one slide text per cell."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return [row for row in csv.reader(f) if any(cell.strip() for cell in row)]
 
   
 if __name__ == "__main__":
-    os.makedirs("temp", exist_ok=True)
-    main()
-    # import shutil
-    # shutil.rmtree(raw_dir, ignore_errors=True)
-
+    parser = argparse.ArgumentParser(description="Generate carousels from the sheet rows and upload them to Drive")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--profile", help="comma separated stages/sections to profile: intake, generate (llm), fetch, render, upload, font, catalog (default: profile_stages)")
+    parser.add_argument("--profile-mode", choices=PROFILE_MODES, help="default: profile_mode, else cpu")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR)
+    parser.add_argument("--daemon", action="store_true", help="stay up and serve jobs from the job queue with everything kept warm")
+    parser.add_argument("--enqueue", choices=JOB_KINDS, help="queue a job for the daemon and exit: sheet re-reads the sheet, rows sends --rows")
+    parser.add_argument("--rows", help="CSV file of rows for --enqueue rows, one slide text per cell")
+    parser.add_argument("--queue", help=f"job queue database (default: job_queue_path, else {JOB_QUEUE_PATH})")
+    args = parser.parse_args()
+    if args.enqueue == "rows" and not args.rows:
+        parser.error("--enqueue rows needs --rows FILE")
+
+    if args.enqueue:
+        # Only the queue is touched, no clients are built
+        queue_path = args.queue or load_config(args.config).get("job_queue_path", JOB_QUEUE_PATH)
+        payload = {"rows": read_rows_file(args.rows)} if args.enqueue == "rows" else {}
+        job_id = JobQueue(queue_path).submit(args.enqueue, payload)
+        print(f"📨 Queued job {job_id} ({args.enqueue}) in {queue_path}")
+    else:
+        init(args.config)
+        profile_stages = args.profile or config.get("profile_stages")
+        profile_mode = args.profile_mode or config.get("profile_mode", "cpu")
+        profiler = StageProfiler(profile_stages, profile_mode, args.profile_dir)
+
+        os.makedirs("temp", exist_ok=True)
+        try:
+            if args.daemon:
+                run_daemon(JobQueue(args.queue or config.get("job_queue_path", JOB_QUEUE_PATH)), profiler)
+            else:
+                main(profiler)
+        finally:
+            # This run's scratch space goes whether main() finished or raised
+            workspace.close()
+            workspace_stats = workspace.stats()
+            print(f"🧹 Workspace: {workspace_stats['bytes_written']} bytes written, {workspace_stats['bytes_freed']} bytes freed, {workspace_stats['evicted']} evicted")
@@ -0,0 +1,183 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+BACKGROUND_CACHE_DIR = os.path.join("cache", "backgrounds")
+
+
+def fit_crop(src_size, dst_size, centering=(0.5, 0.5)):
+    """The (left, top, right, bottom) source crop ImageOps.fit scales to dst_size."""
+    src_w, src_h = src_size
+    dst_ratio = dst_size[0] / dst_size[1]
+    crop_w, crop_h = src_w, src_h
+    if src_w / src_h > dst_ratio:
+        crop_w = dst_ratio * src_h
+    elif src_w / src_h < dst_ratio:
+        crop_h = src_w / dst_ratio
+    left = (src_w - crop_w) * centering[0]
+    top = (src_h - crop_h) * centering[1]
+    return (left, top, left + crop_w, top + crop_h)
+
+
+def load_fitted(image_path, size, centering=(0.5, 0.5)):
+    """
+    Decode image_path straight to `size` like ImageOps.fit(..., LANCZOS), returning (image, source_size).
+
+    JPEGs are decoded at the smallest 1/2, 1/4 or 1/8 scale still covering the crop,
+    other formats are box-reduced before the final LANCZOS pass.
+    """
+    with Image.open(image_path) as img:
+        source_size = img.size
+        left, top, right, bottom = fit_crop(source_size, size, centering)
+        scale = max(size[0] / (right - left), size[1] / (bottom - top))
+        img.draft(img.mode, (int(source_size[0] * scale) + 1, int(source_size[1] * scale) + 1))
+
+        # draft() may have shrunk the image, move the crop into its pixels
+        ratio = img.size[0] / source_size[0]
+        crop = (left * ratio, top * ratio, right * ratio, bottom * ratio)
+        fitted = img.resize(size, Image.Resampling.LANCZOS, box=crop, reducing_gap=3.0)
+    return fitted, source_size
+
+
+class BackgroundCache:
+    """
+    Fitted output-size backgrounds keyed by source content hash and size.
+
+    Entries are raw pixel dumps on disk, so a repeated background is one file read with no
+    decode or resampling; the most recent few are also kept in memory. Disk entries are
+    evicted least recently used once they exceed max_bytes.
+    """
+
+    def __init__(self, root=BACKGROUND_CACHE_DIR, max_bytes=1024 ** 3, memory_items=8):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._hashes = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def source_hash(self, image_path):
+        stat = os.stat(image_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._hashes.get(image_path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        with open(image_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        with self._lock:
+            self._hashes[image_path] = (signature, digest)
+        return digest
+
+    def _paths(self, digest, size):
+        prefix = os.path.join(self.root, f"{digest}-{size[0]}x{size[1]}")
+        return {mode: f"{prefix}.{mode}.raw" for mode in ("RGB", "RGBA")}
+
+    def get(self, image_path, size):
+        """Fitted RGBA background and the source's original size."""
+        size = tuple(size)
+        key = (self.source_hash(image_path), size)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            return entry[0].convert("RGBA"), entry[1]
+
+        img = self._read(key)
+        if img is not None:
+            with self._lock:
+                self.hits += 1
+        else:
+            with self._lock:
+                self.misses += 1
+            img, _ = load_fitted(image_path, size)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+            self._write(key, img)
+
+        with Image.open(image_path) as src:
+            source_size = src.size  # header only
+        with self._lock:
+            self._memory[key] = (img, source_size)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+        return img.convert("RGBA"), source_size
+
+    def _read(self, key):
+        for mode, path in self._paths(*key).items():
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)
+            except FileNotFoundError:
+                continue
+            if len(data) == key[1][0] * key[1][1] * len(mode):
+                return Image.frombytes(mode, key[1], data)
+        return None
+
+    def _write(self, key, img):
+        path = self._paths(*key)[img.mode]
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(img.tobytes())
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if name.endswith(".tmp") or not os.path.isfile(path):
+                    continue
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            freed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue  # another render process got there first
+                total -= size
+                freed += size
+            return freed
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_background_cache(config=None):
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            max_mb = (config or {}).get("background_cache_max_mb", 1024)
+            _cache = BackgroundCache(max_bytes=max_mb * 1024 ** 2)
+    return _cache
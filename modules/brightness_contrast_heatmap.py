@@ -1 +1,116 @@
-brightness_contrast_heatmap.py
\ No newline at end of file
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image
+
+
+def integral_images(gray):
+    """Summed-area tables of the pixels and of their squares, with a zero first row and column."""
+    values = np.asarray(gray, dtype=np.float64)
+    sums = np.zeros((values.shape[0] + 1, values.shape[1] + 1))
+    squares = np.zeros_like(sums)
+    sums[1:, 1:] = values.cumsum(0).cumsum(1)
+    squares[1:, 1:] = (values * values).cumsum(0).cumsum(1)
+    return sums, squares
+
+
+def offsets(first, last, step):
+    """first, first + step, ... up to last, always ending on last itself; empty when last < first."""
+    if last < first:
+        return np.arange(0)
+    values = np.arange(first, last + 1, step)
+    return values if values[-1] == last else np.append(values, last)
+
+
+def window_sums(table, box_w, box_h, xs, ys):
+    """Sum of every box_w x box_h window whose top-left corner is at one of xs and ys."""
+    top, bottom = ys[:, None], ys[:, None] + box_h
+    left, right = xs[None, :], xs[None, :] + box_w
+    return table[bottom, right] - table[top, right] - table[bottom, left] + table[top, left]
+
+
+@dataclass
+class Heatmap:
+    """Per-window brightness/contrast scores (lower is better for text), inf where text may not go."""
+    scores: np.ndarray
+    mean: np.ndarray
+    std: np.ndarray
+    xs: np.ndarray
+    ys: np.ndarray
+    box_size: tuple
+    scale: int
+
+    def best_region(self):
+        if not np.isfinite(self.scores).any():
+            return None
+        row, col = np.unravel_index(np.argmin(self.scores), self.scores.shape)
+        x, y = int(self.xs[col]) * self.scale, int(self.ys[row]) * self.scale
+        return (x, y, x + self.box_size[0], y + self.box_size[1])
+
+
+def compute_heatmap(image, box_size=(400, 300), stride=10, avoid_boxes=(), allowed_box=None, scale=4):
+    """
+    Mean and stddev of every box_size window in one NumPy pass over summed-area tables.
+
+    The image is reduced by `scale` first and windows step by `stride` full-size pixels,
+    starting at allowed_box's top-left corner and always including its last offset, so a box
+    exactly as wide as allowed_box still has windows at any stride. Windows touching an avoid
+    box (e.g. a detected phone) or leaving allowed_box (e.g. the TikTok safe area) are scored inf.
+    """
+    scale = max(1, scale)
+    gray = image.convert("L")
+    if scale > 1:
+        gray = gray.reduce(scale)
+
+    box_w = max(1, box_size[0] // scale)
+    box_h = max(1, box_size[1] // scale)
+    step = max(1, stride // scale)
+    if box_w > gray.width or box_h > gray.height:
+        empty = np.full((0, 0), np.inf)
+        return Heatmap(empty, empty, empty, np.arange(0), np.arange(0), box_size, scale)
+
+    # Only offsets whose full-size window can lie inside allowed_box
+    x1, y1, x2, y2 = allowed_box if allowed_box is not None else (0, 0, image.width, image.height)
+    xs = offsets(max(0, -(-x1 // scale)), min(gray.width - box_w, (x2 - box_size[0]) // scale), step)
+    ys = offsets(max(0, -(-y1 // scale)), min(gray.height - box_h, (y2 - box_size[1]) // scale), step)
+
+    sums, squares = integral_images(gray)
+    area = box_w * box_h
+    total = window_sums(sums, box_w, box_h, xs, ys)
+    total_sq = window_sums(squares, box_w, box_h, xs, ys)
+    mean = total / area
+    std = np.sqrt(np.maximum(total_sq / area - mean * mean, 0))
+    scores = std + np.abs(mean - 128)
+
+    # Window corners back in full-size pixels
+    left = xs[None, :] * scale
+    top = ys[:, None] * scale
+    right = left + box_size[0]
+    bottom = top + box_size[1]
+
+    blocked = np.zeros(scores.shape, dtype=bool)
+    if allowed_box is not None:
+        a1, b1, a2, b2 = allowed_box
+        blocked |= (left < a1) | (right > a2) | (top < b1) | (bottom > b2)
+    for a1, b1, a2, b2 in avoid_boxes:
+        blocked |= (left <= a2) & (right >= a1) & (top <= b2) & (bottom >= b1)
+    scores = np.where(blocked, np.inf, scores)
+
+    return Heatmap(scores, mean, std, xs, ys, tuple(box_size), scale)
+
+
+def find_best_text_region(image, avoid_boxes=[], box_size=(400, 300), stride=10, allowed_box=None, scale=4):
+    """Calmest mid-tone box_size region as (x1, y1, x2, y2), or None if every window is masked."""
+    return compute_heatmap(image, box_size, stride, avoid_boxes, allowed_box, scale).best_region()
+
+
+def heatmap_image(heatmap, size):
+    """Scores as a greyscale image (dark = good place for text) scaled to `size`, for debugging."""
+    scores = heatmap.scores.copy()
+    finite = np.isfinite(scores)
+    if not finite.any():
+        return Image.new("L", size, 255)
+    scores[~finite] = scores[finite].max()
+    span = scores.max() - scores.min() or 1
+    pixels = ((scores - scores.min()) / span * 255).astype(np.uint8)
+    return Image.fromarray(pixels, "L").resize(size, Image.Resampling.NEAREST)
@@ -0,0 +1,104 @@
+import os
+import threading
+
+from PIL import Image
+
+DOWNLOAD_CACHE_DIR = os.path.join("cache", "downloads")
+
+MIME_TO_EXT = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/bmp': '.bmp',
+    'image/tiff': '.tiff',
+    'image/webp': '.webp',
+}
+
+
+class DownloadCache:
+    """
+    Content-addressed store for downloaded Drive images.
+
+    Entries are keyed by file id plus md5Checksum, so an edited file gets a new entry.
+    Writes go to a temp file and are renamed into place, hits bump the file's mtime,
+    and the least recently used entries are evicted once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, backend, root=DOWNLOAD_CACHE_DIR, max_bytes=2 * 1024 ** 3):
+        self.backend = backend
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, meta):
+        version = meta.get('md5Checksum') or meta.get('modifiedTime', 'unversioned').replace(':', '')
+        ext = MIME_TO_EXT.get(meta.get('mimeType'), '')
+        return os.path.join(self.root, f"{meta['id'].replace('/', '_')}-{version}{ext}")
+
+    def fetch(self, meta):
+        path = self.path_for(meta)
+        if os.path.exists(path):
+            try:
+                os.utime(path)
+                with self._lock:
+                    self.hits += 1
+                return path
+            except FileNotFoundError:
+                pass  # evicted between the check and the touch
+
+        with self._lock:
+            self.misses += 1
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as fh:
+                self.backend.download(meta['id'], fh)
+            with Image.open(tmp_path) as img:
+                img.verify()
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if name.endswith(".tmp") or not os.path.isfile(path):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # evicted by another process sharing the cache
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            freed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                total -= size
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue  # another process got there first
+                freed += size
+            return freed
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
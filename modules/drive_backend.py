@@ -0,0 +1,163 @@
+import hashlib
+import mimetypes
+import os
+import shutil
+from datetime import datetime, timezone
+
+from modules import google_clients
+from modules.fake_api import with_faults
+from modules.utils import retry_transient
+
+FILE_FIELDS = "id, name, mimeType, md5Checksum, modifiedTime"
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+PAGE_SIZE = 1000
+# Resumable upload chunks must be a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class GoogleDriveBackend:
+    """Drive API calls the pipeline makes, with full pagination."""
+
+    def list_files(self, folder_id, modified_after=None, ids_only=False, images_only=True):
+        query = f"'{folder_id}' in parents and trashed = false"
+        if images_only:
+            query += " and mimeType contains 'image/'"
+        if modified_after:
+            query += f" and modifiedTime > '{modified_after}'"
+        fields = f"nextPageToken, files({'id' if ids_only else FILE_FIELDS})"
+
+        files = []
+        page_token = None
+        while True:
+            request = google_clients.drive().files().list(
+                q=query,
+                spaces='drive',
+                fields=fields,
+                pageSize=PAGE_SIZE,
+                pageToken=page_token,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True
+            )
+            response = retry_transient(request.execute, api="drive")
+            files.extend(response.get('files', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return files
+
+    def get_file(self, file_id):
+        request = google_clients.drive().files().get(
+            fileId=file_id,
+            fields=FILE_FIELDS,
+            supportsAllDrives=True
+        )
+        return retry_transient(request.execute, api="drive")
+
+    def download(self, file_id, fh):
+        from googleapiclient.http import MediaIoBaseDownload
+
+        request = google_clients.drive().files().get_media(fileId=file_id, supportsAllDrives=True)
+        downloader = MediaIoBaseDownload(fh, request)
+        done = False
+        while not done:
+            _, done = retry_transient(downloader.next_chunk, api="drive")
+
+    def create_folder(self, name, parent_id):
+        request = google_clients.drive().files().create(
+            body={'name': name, 'mimeType': FOLDER_MIME_TYPE, 'parents': [parent_id]},
+            fields='id, name',
+            supportsAllDrives=True
+        )
+        return retry_transient(request.execute, api="drive")['id']
+
+    def upload_file(self, name, parent_id, fh, mime_type):
+        """Chunked resumable upload. A dropped chunk is retried and resumes from the last byte Drive acknowledged."""
+        from googleapiclient.http import MediaIoBaseUpload
+
+        media = MediaIoBaseUpload(fh, mimetype=mime_type, chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
+        request = google_clients.drive().files().create(
+            body={'name': name, 'parents': [parent_id]},
+            media_body=media,
+            fields='id, name',
+            supportsAllDrives=True
+        )
+        response = None
+        while response is None:
+            _, response = retry_transient(request.next_chunk, api="drive")
+        return response['id']
+
+
+class LocalDriveBackend:
+    """
+    Folder tree standing in for Drive: folder ids are directories under `root`
+    and file ids are "<folder_id>/<file name>".
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._checksums = {}
+
+    def _path(self, file_id):
+        return os.path.join(self.root, *file_id.split("/"))
+
+    def _metadata(self, file_id):
+        path = self._path(file_id)
+        stat = os.stat(path)
+        checksum_key = (path, stat.st_mtime_ns, stat.st_size)
+        checksum = self._checksums.get(checksum_key)
+        if checksum is None:
+            with open(path, "rb") as f:
+                checksum = hashlib.md5(f.read()).hexdigest()
+            self._checksums[checksum_key] = checksum
+        modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+        return {
+            "id": file_id,
+            "name": os.path.basename(path),
+            "mimeType": mimetypes.guess_type(path)[0] or "application/octet-stream",
+            "md5Checksum": checksum,
+            "modifiedTime": modified.isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+        }
+
+    def list_files(self, folder_id, modified_after=None, ids_only=False, images_only=True):
+        folder = self._path(folder_id)
+        if not os.path.isdir(folder):
+            return []
+
+        files = []
+        for name in sorted(os.listdir(folder)):
+            if not os.path.isfile(os.path.join(folder, name)):
+                continue
+            meta = self._metadata(f"{folder_id}/{name}")
+            if images_only and not meta["mimeType"].startswith("image/"):
+                continue
+            if modified_after and meta["modifiedTime"] <= modified_after:
+                continue
+            files.append({"id": meta["id"]} if ids_only else meta)
+        return files
+
+    def get_file(self, file_id):
+        if not os.path.isfile(self._path(file_id)):
+            return None
+        return self._metadata(file_id)
+
+    def download(self, file_id, fh):
+        with open(self._path(file_id), "rb") as src:
+            shutil.copyfileobj(src, fh)
+
+    def create_folder(self, name, parent_id):
+        folder_id = f"{parent_id}/{name}"
+        os.makedirs(self._path(folder_id), exist_ok=True)
+        return folder_id
+
+    def upload_file(self, name, parent_id, fh, mime_type):
+        file_id = f"{parent_id}/{name}"
+        os.makedirs(self._path(parent_id), exist_ok=True)
+        with open(self._path(file_id), "wb") as dst:
+            shutil.copyfileobj(fh, dst)
+        return file_id
+
+
+def make_drive_backend(config):
+    local_root = config.get("local_drive_root")
+    if local_root:
+        return with_faults(LocalDriveBackend(local_root), "drive", config)
+    return GoogleDriveBackend()
@@ -1,63 +1,114 @@
+import io
+import mimetypes
 import os
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
-from googleapiclient.http import MediaFileUpload
-
-SCOPES = ['https://www.googleapis.com/auth/drive']
-
-def upload_folder_to_drive(folder_path, parent_id):
-    creds = Credentials.from_service_account_file('credentials.json', scopes=SCOPES)
-    service = build('drive', 'v3', credentials=creds)
-
-    # Map file extensions to MIME types
-    ext_to_mime = {
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png',
-        '.gif': 'image/gif',
-        '.bmp': 'image/bmp',
-        '.tiff': 'image/tiff'
-    }
+import re
+from concurrent.futures import ThreadPoolExecutor
 
+from modules.drive_backend import GoogleDriveBackend
+
+UPLOAD_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".webp")
+
+
+def guess_mime_type(file_name):
+    return mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+
+
+def slide_order(file_name):
+    # slide2.jpg before slide10.jpg
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", file_name)]
+
+
+def list_upload_files(folder_path):
+    return [
+        os.path.join(folder_path, name)
+        for name in sorted(os.listdir(folder_path), key=slide_order)
+        if name.lower().endswith(UPLOAD_EXTENSIONS) and os.path.isfile(os.path.join(folder_path, name))
+    ]
+
+
+class UploadManifest:
+    """Uploads of one Drive folder, in slide order."""
+
+    def __init__(self, folder_id, names, futures):
+        self.folder_id = folder_id
+        self.names = names
+        self.futures = futures
+
+    def wait(self):
+        """File ids in slide order, None where an upload failed (see errors())."""
+        file_ids = []
+        for name, future in zip(self.names, self.futures):
+            try:
+                file_ids.append(future.result())
+            except Exception:
+                file_ids.append(None)
+        return file_ids
+
+    def errors(self):
+        return {
+            name: future.exception()
+            for name, future in zip(self.names, self.futures)
+            if future.exception() is not None
+        }
+
+
+class Uploader:
+    """
+    Shared bounded pool for every upload in a run. Submitting returns a manifest at once,
+    so a run's carousels upload side by side instead of one file after another.
+    """
+
+    def __init__(self, backend=None, max_workers=8):
+        self.backend = backend or GoogleDriveBackend()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload")
+
+    def _upload_path(self, folder_id, path):
+        name = os.path.basename(path)
+        with open(path, "rb") as fh:
+            file_id = self.backend.upload_file(name, folder_id, fh, guess_mime_type(name))
+        print(f"📤 Uploaded {name} to Drive folder {folder_id}")
+        return file_id
+
+    def _upload_bytes(self, folder_id, name, data):
+        file_id = self.backend.upload_file(name, folder_id, io.BytesIO(data), guess_mime_type(name))
+        print(f"📤 Uploaded {name} ({len(data)} bytes) to Drive folder {folder_id}")
+        return file_id
+
+    def submit_files(self, folder_id, paths):
+        futures = [self._pool.submit(self._upload_path, folder_id, path) for path in paths]
+        return UploadManifest(folder_id, [os.path.basename(p) for p in paths], futures)
+
+    def submit_folder(self, folder_id, folder_path):
+        return self.submit_files(folder_id, list_upload_files(folder_path))
+
+    def submit_buffers(self, folder_id, slides):
+        """Upload in-memory (name, bytes) slides, e.g. from render_carousel."""
+        futures = [self._pool.submit(self._upload_bytes, folder_id, name, data) for name, data in slides]
+        return UploadManifest(folder_id, [name for name, _ in slides], futures)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+def upload_folder_to_drive(folder_path, parent_id, backend=None):
+    backend = backend or GoogleDriveBackend()
+    uploader = Uploader(backend)
     try:
         # Create a folder in the Shared Drive
-        folder_metadata = {
-            'name': os.path.basename(folder_path),
-            'mimeType': 'application/vnd.google-apps.folder',
-            'parents': [parent_id]
-        }
-        folder = service.files().create(
-            body=folder_metadata,
-            fields='id',
-            supportsAllDrives=True
-        ).execute()
-        folder_id = folder.get('id')
+        folder_id = backend.create_folder(os.path.basename(folder_path), parent_id)
         print(f"✅ Created folder {folder_id} in Shared Drive")
 
-        # Upload each file in the folder
-        for file_name in os.listdir(folder_path):
-            file_path = os.path.join(folder_path, file_name)
-            if os.path.isfile(file_path):
-                # Get MIME type based on file extension
-                file_ext = os.path.splitext(file_name)[1].lower()
-                mime_type = ext_to_mime.get(file_ext, 'application/octet-stream')
-                
-                file_metadata = {
-                    'name': file_name,
-                    'parents': [folder_id]
-                }
-                media = MediaFileUpload(file_path, mimetype=mime_type)
-                service.files().create(
-                    body=file_metadata,
-                    media_body=media,
-                    fields='id',
-                    supportsAllDrives=True
-                ).execute()
-                print(f"✅ Uploaded {file_name} to folder {folder_id}")
+        manifest = uploader.submit_folder(folder_id, folder_path)
+        manifest.wait()
+        errors = manifest.errors()
+        if errors:
+            raise RuntimeError(f"{len(errors)} uploads failed: {errors}")
 
         print(f"✅ Uploaded {folder_path} to Google Drive")
         return folder_id
 
     except Exception as e:
         print(f"❌ Error uploading folder {folder_path}: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+    finally:
+        uploader.close()
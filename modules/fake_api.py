@@ -0,0 +1,118 @@
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeHttpError(Exception):
+    """Looks like an openai APIStatusError to modules.utils.error_status."""
+
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+
+
+class APIConnectionError(Exception):
+    """Named like openai's connection error, which has no status code and is not a ConnectionError."""
+
+
+class APITimeoutError(APIConnectionError):
+    pass
+
+
+class FakeQuotaServer:
+    """
+    Stand-in for a quota-limited API, for exercising the rate limiter offline. call() succeeds
+    while the server's own token bucket (rate per second, burst) has room, else raises 429;
+    error_rate of the calls fail with a 503 and every call takes `latency` seconds.
+    """
+
+    def __init__(self, rate, burst=None, error_rate=0.0, latency=0.0, retry_after=None,
+                 clock=time.monotonic, sleep=time.sleep, seed=0):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.error_rate = error_rate
+        self.latency = latency
+        self.retry_after = retry_after
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.ok = 0
+        self.throttled = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(self, payload=None):
+        if self.latency:
+            self.sleep(self.latency)
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                self.throttled += 1
+                raise FakeHttpError(429, self.retry_after)
+            self.tokens -= 1
+            if self._rng.random() < self.error_rate:
+                self.errors += 1
+                raise FakeHttpError(503)
+            self.ok += 1
+        return payload
+
+    def stats(self):
+        return {"ok": self.ok, "throttled": self.throttled, "errors": self.errors}
+
+
+class Flaky:
+    """
+    Proxy adding `latency` seconds to every method call on target and failing `error_rate`
+    of them with a 503 before the call reaches target, so a retried call is always safe.
+    """
+
+    def __init__(self, target, latency=0.0, error_rate=0.0, seed=None, sleep=time.sleep):
+        self._target = target
+        self._latency = latency
+        self._error_rate = error_rate
+        self._sleep = sleep
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            if self._latency:
+                self._sleep(self._latency)
+            with self._lock:
+                failed = self._rng.random() < self._error_rate
+            if failed:
+                raise FakeHttpError(503)
+            return attr(*args, **kwargs)
+
+        return call
+
+
+def with_faults(backend, api, config):
+    """
+    backend behind the fault_injection settings for api in config.yaml, e.g.
+    fault_injection: {drive: {latency: 0.05, error_rate: 0.02}}. Injected errors are
+    retried by the shared scheduler like real API errors. backend itself when none are set.
+    """
+    faults = (config.get("fault_injection") or {}).get(api)
+    if not faults:
+        return backend
+    from modules.rate_limiter import Scheduled
+    return Scheduled(Flaky(backend, **faults), api)
+
+
+def flaky_openai(client, config):
+    """OpenAI-style client whose chat.completions.create gets the fault_injection settings for "openai"."""
+    faults = (config.get("fault_injection") or {}).get("openai")
+    if not faults:
+        return client
+    return SimpleNamespace(chat=SimpleNamespace(completions=Flaky(client.chat.completions, **faults)))
@@ -0,0 +1,109 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import ImageFont
+
+FONT_CACHE_DIR = os.path.join("cache", "fonts")
+
+
+class FontRegistry:
+    """
+    Process-wide font store shared by every slide and carousel in a run.
+
+    Fonts are keyed by their local path. The bytes are read and validated once, and
+    FreeTypeFont objects are handed out from an LRU keyed by (font, size).
+    """
+
+    def __init__(self, cache_dir=FONT_CACHE_DIR, max_fonts=64):
+        self.cache_dir = cache_dir
+        self.max_fonts = max_fonts
+        self._data = {}
+        self._fonts = OrderedDict()
+        self._folders = {}
+        self._lock = threading.RLock()
+
+    def register_bytes(self, key, data):
+        with self._lock:
+            if key not in self._data:
+                # Validate once, every later load is from the same bytes
+                ImageFont.truetype(io.BytesIO(data), 10)
+                self._data[key] = data
+        return key
+
+    def register_path(self, path):
+        with self._lock:
+            if path not in self._data:
+                with open(path, "rb") as f:
+                    self.register_bytes(path, f.read())
+        return path
+
+    def font(self, key, size):
+        cache_key = (key, size)
+        with self._lock:
+            font = self._fonts.get(cache_key)
+            if font is not None:
+                self._fonts.move_to_end(cache_key)
+                return font
+            if key not in self._data:
+                self.register_path(key)
+            font = ImageFont.truetype(io.BytesIO(self._data[key]), size)
+            self._fonts[cache_key] = font
+            if len(self._fonts) > self.max_fonts:
+                self._fonts.popitem(last=False)
+            return font
+
+    def fetch_from_folder(self, backend, folder_id):
+        """Return the first TTF in a Drive folder, downloading it at most once per file id and checksum."""
+        with self._lock:
+            if folder_id in self._folders:
+                return self._folders[folder_id]
+
+            font_file = next(
+                (f for f in backend.list_files(folder_id, images_only=False) if f['name'].lower().endswith('.ttf')),
+                None
+            )
+            if font_file is None:
+                print("⚠️ No TTF font found in folder")
+                return None
+
+            checksum = font_file.get('md5Checksum', '')
+            # Local file ids contain the folder path
+            safe_id = font_file['id'].replace("/", "_")
+            path = os.path.join(self.cache_dir, f"{safe_id}-{checksum or 'nochecksum'}.ttf")
+            data = self._read_cached(path, checksum)
+            if data is None:
+                buffer = io.BytesIO()
+                backend.download(font_file['id'], buffer)
+                data = buffer.getvalue()
+                self._write_cached(path, data)
+                print(f"✅ Font downloaded: {font_file['name']}")
+            else:
+                print(f"✅ Font loaded from cache: {font_file['name']}")
+
+            self.register_bytes(path, data)
+            self._folders[folder_id] = path
+            return path
+
+    def _read_cached(self, path, checksum):
+        if not checksum or not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+        return data if hashlib.md5(data).hexdigest() == checksum else None
+
+    def _write_cached(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+_registry = FontRegistry()
+
+
+def get_registry():
+    return _registry
@@ -0,0 +1,75 @@
+from PIL import Image, ImageChops, ImageDraw, ImageFilter
+
+
+def _dilate(mask, radius):
+    """Square dilation of an "L" mask, same footprint as drawing the text at every (dx, dy) offset."""
+    if radius <= 0:
+        return mask
+
+    def spread(src, horizontal):
+        out = src.copy()
+        for d in range(1, radius + 1):
+            for offset in (d, -d):
+                shifted = Image.new("L", src.size, 0)
+                shifted.paste(src, (offset, 0) if horizontal else (0, offset))
+                out = ImageChops.lighter(out, shifted)
+        return out
+
+    return spread(spread(mask, True), False)
+
+
+def text_block_box(lines, font, image_size, padding):
+    """Union bbox of all placed lines, padded and clamped to the image."""
+    left = top = float("inf")
+    right = bottom = float("-inf")
+    for (x, y), text in lines:
+        l, t, r, b = font.getbbox(text)
+        left, top = min(left, x + l), min(top, y + t)
+        right, bottom = max(right, x + r), max(bottom, y + b)
+
+    width, height = image_size
+    return (
+        max(0, int(left) - padding),
+        max(0, int(top) - padding),
+        min(width, int(right) + padding + 1),
+        min(height, int(bottom) + padding + 1),
+    )
+
+
+def draw_glow_text_block(base_img, lines, font, fill="white", glow_color="#FF4EDB", glow_radius=10, blur_radius=8):
+    """
+    Draw every line of a slide with a soft glow, compositing the glow once.
+
+    `lines` is a list of ((x, y), text) placements. The text mask is rasterized once,
+    dilated and blurred only inside the padded text-block box, instead of drawing each
+    line (2 * glow_radius + 1) ** 2 times onto a full-size layer like draw_soft_glow_text.
+    """
+    lines = [(position, text) for position, text in lines if text]
+    if not lines:
+        return base_img
+
+    # Gaussian blur reaches ~3 sigma, keep the whole falloff inside the crop
+    padding = glow_radius + int(3 * blur_radius) + 2
+    box = text_block_box(lines, font, base_img.size, padding)
+    left, top, right, bottom = box
+    if right <= left or bottom <= top:
+        return base_img
+
+    mask = Image.new("L", (right - left, bottom - top), 0)
+    mask_draw = ImageDraw.Draw(mask)
+    for (x, y), text in lines:
+        mask_draw.text((x - left, y - top), text, font=font, fill=255)
+    mask = _dilate(mask, glow_radius)
+
+    # Pasting through the mask blends colour and alpha the same way the repeated draws did
+    glow_layer = Image.new("RGBA", mask.size, (0, 0, 0, 0))
+    glow_layer.paste(Image.new("RGBA", mask.size, glow_color), (0, 0), mask)
+    glow_layer = glow_layer.filter(ImageFilter.GaussianBlur(blur_radius))
+
+    base_img.alpha_composite(glow_layer, dest=(left, top))
+
+    draw = ImageDraw.Draw(base_img)
+    for position, text in lines:
+        draw.text(position, text, font=font, fill=fill)
+
+    return base_img
@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+import weakref
+
+# The Google client libraries are imported on first use, so importing this module stays cheap
+CREDENTIALS_FILE = 'credentials.json'
+DISCOVERY_CACHE_DIR = os.path.join("cache", "discovery")
+HTTP_TIMEOUT = 60
+
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive']
+SHEETS_SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+
+_lock = threading.Lock()
+_credentials = {}
+_documents = {}
+# httplib2.Http is not thread-safe, so each thread leases its own keep-alive connection
+# and service object. When the thread ends they go back to _idle for the next thread,
+# so short-lived pipeline threads reuse warm clients instead of building new ones.
+_local = threading.local()
+_idle = {}
+
+
+def get_credentials(scopes):
+    from google.oauth2.service_account import Credentials
+
+    key = tuple(scopes)
+    with _lock:
+        creds = _credentials.get(key)
+        if creds is None:
+            creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=list(scopes))
+            _credentials[key] = creds
+    return creds
+
+
+def get_discovery_document(api, version):
+    """Discovery document from cache/discovery, the library's bundled copy, or the network, in that order."""
+    import httplib2
+    from googleapiclient import discovery
+    from googleapiclient.discovery_cache import get_static_doc
+
+    key = (api, version)
+    with _lock:
+        document = _documents.get(key)
+        if document is not None:
+            return document
+
+        path = os.path.join(DISCOVERY_CACHE_DIR, f"{api}.{version}.json")
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                document = f.read()
+        else:
+            document = get_static_doc(api, version)
+            if document is None:
+                uri = discovery.V2_DISCOVERY_URI.format(api=api, apiVersion=version)
+                response, content = httplib2.Http(timeout=HTTP_TIMEOUT).request(uri)
+                if response.status >= 400:
+                    raise RuntimeError(f"❌ Failed to fetch discovery document for {api} {version}: {response.status}")
+                document = content.decode("utf-8")
+            json.loads(document)
+            os.makedirs(DISCOVERY_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(document)
+            os.replace(tmp_path, path)
+
+        _documents[key] = document
+        return document
+
+
+def _release(services):
+    with _lock:
+        for key, service in services.items():
+            _idle.setdefault(key, []).append(service)
+
+
+class _Lease:
+    """One thread's services, handed back to _idle when the thread's locals are cleared at exit."""
+
+    def __init__(self):
+        self.services = {}
+        weakref.finalize(self, _release, self.services)
+
+
+def get_service(api, version, scopes):
+    lease = getattr(_local, "lease", None)
+    if lease is None:
+        lease = _local.lease = _Lease()
+
+    key = (api, version, tuple(scopes))
+    service = lease.services.get(key)
+    if service is None:
+        with _lock:
+            idle = _idle.get(key)
+            service = idle.pop() if idle else None
+    if service is None:
+        import google_auth_httplib2
+        import httplib2
+        from googleapiclient import discovery
+
+        http = google_auth_httplib2.AuthorizedHttp(
+            get_credentials(scopes),
+            http=httplib2.Http(timeout=HTTP_TIMEOUT)
+        )
+        service = discovery.build_from_document(get_discovery_document(api, version), http=http)
+    lease.services[key] = service
+    return service
+
+
+def drive():
+    return get_service('drive', 'v3', DRIVE_SCOPES)
+
+
+def sheets():
+    return get_service('sheets', 'v4', SHEETS_SCOPES)
@@ -0,0 +1,82 @@
+import json
+import os
+import random
+from datetime import datetime, timezone
+
+CATALOG_PATH = os.path.join("cache", "image_catalog.json")
+
+
+class ImageCatalog:
+    """
+    Persisted index of the background image folders.
+
+    The first sync of a folder lists it in full. Later syncs only fetch files modified
+    since the newest modifiedTime already seen, plus an ids-only listing to pick up
+    files moved in or out of the folder, so slide selection never hits Drive.
+    """
+
+    def __init__(self, backend, path=CATALOG_PATH):
+        self.backend = backend
+        self.path = path
+        self.folders = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.folders = json.load(f).get("folders", {})
+
+    def sync(self, folder_ids):
+        for folder_id in folder_ids:
+            folder_id = folder_id.strip() if folder_id else folder_id
+            if not folder_id:
+                continue
+            entry = self.folders.get(folder_id)
+            if entry is None:
+                files = self.backend.list_files(folder_id)
+                entry = {"files": {f["id"]: f for f in files}}
+                print(f"🗂️ Catalogued folder {folder_id}: {len(files)} images")
+            else:
+                added, updated, removed = self._sync_changes(folder_id, entry["files"])
+                if added or updated or removed:
+                    print(f"🗂️ Folder {folder_id}: +{added} ~{updated} -{removed}")
+            entry["watermark"] = max((f.get("modifiedTime", "") for f in entry["files"].values()), default="")
+            entry["synced_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            self.folders[folder_id] = entry
+        self.save()
+
+    def _sync_changes(self, folder_id, files):
+        current_ids = {f["id"] for f in self.backend.list_files(folder_id, ids_only=True)}
+        watermark = max((f.get("modifiedTime", "") for f in files.values()), default="")
+
+        added = updated = 0
+        for meta in self.backend.list_files(folder_id, modified_after=watermark or None):
+            if meta["id"] in files:
+                updated += 1
+            else:
+                added += 1
+            files[meta["id"]] = meta
+
+        # Moved in without a newer modifiedTime
+        for file_id in current_ids - files.keys():
+            meta = self.backend.get_file(file_id)
+            if meta:
+                files[file_id] = meta
+                added += 1
+
+        removed_ids = files.keys() - current_ids
+        for file_id in removed_ids:
+            del files[file_id]
+        return added, updated, len(removed_ids)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"folders": self.folders}, f)
+        os.replace(tmp_path, self.path)
+
+    def images(self, folder_id):
+        entry = self.folders.get(folder_id.strip(), {})
+        return sorted(entry.get("files", {}).values(), key=lambda f: f["name"])
+
+    def pick(self, folder_id, rng=random):
+        images = self.images(folder_id)
+        return rng.choice(images) if images else None
@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from modules.download_cache import MIME_TO_EXT
+
+
+@dataclass
+class FetchResult:
+    index: int
+    file: dict = None
+    path: str = None
+    error: str = None
+
+    @property
+    def ok(self):
+        return self.path is not None
+
+
+def fetch_images(cache, files, max_workers=8, pool=None):
+    """
+    Download every selected background at once through a bounded thread pool.
+
+    `files` holds listing metadata (or None for a slide with no image) and the results
+    come back in the same order, each with either a local path or an error message.
+    Pass a long-lived pool so its threads keep their Drive clients and connections between calls.
+    Transient errors are retried by the Drive backend under its rate limiter, not here.
+    """
+    def fetch_one(index, meta):
+        if meta is None:
+            return FetchResult(index, error="no image selected")
+        if meta.get('mimeType') not in MIME_TO_EXT:
+            return FetchResult(index, meta, error=f"not a supported image (MIME: {meta.get('mimeType')})")
+        try:
+            path = cache.fetch(meta)
+            return FetchResult(index, meta, path=path)
+        except Exception as e:
+            return FetchResult(index, meta, error=str(e) or type(e).__name__)
+
+    if not files:
+        return []
+    if pool is not None:
+        return list(pool.map(fetch_one, range(len(files)), files))
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as pool:
+        return list(pool.map(fetch_one, range(len(files)), files))
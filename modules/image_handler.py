@@ -1,13 +1,15 @@
-from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps
+from PIL import Image, ImageDraw, ImageFilter
 import textwrap
 import os
 from datetime import datetime
-import yaml
-import requests
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
-import ultralytics
-from ultralytics import YOLO
+from modules import google_clients
+from modules.font_registry import get_registry
+from modules.background_cache import get_background_cache
+from modules.brightness_contrast_heatmap import find_best_text_region
+from modules.glow import draw_glow_text_block
+from modules.phone_detector import fit_box, get_detector
+from modules.slide_encoder import encode_slide, save_slide
+from modules.text_layout import fit_text
 
 def get_tiktok_safe_area(image_width, image_height):
     # These values are approximate and can be tweaked per device
@@ -31,25 +33,36 @@ def draw_safe_area_outline(image, safe_box):
     return image
 
 def detect_phones(image_path):
-    model = YOLO("yolov8n.pt")  # Make sure this model file is downloaded
-    results = model(image_path)
-    boxes = []
-    for r in results:
-        for box in r.boxes:
-            cls_id = int(box.cls[0])
-            label = r.names[cls_id]
-            if label.lower() == "cell phone":
-                # print(f"📱 Detected phone at: ({x1}, {y1}, {x2}, {y2}) with label: {label}: {image_path}")
-                # exit()
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                boxes.append((x1, y1, x2, y2))
-    return boxes
+    # Resident model and on-disk cache, see modules/phone_detector.py
+    return get_detector().detect([image_path])[0]
 
 def box_overlap(box1, box2):
     x1, y1, x2, y2 = box1
     a1, b1, a2, b2 = box2
     return not (x2 < a1 or x1 > a2 or y2 < b1 or y1 > b2)
 
+def overlap_area(box1, box2):
+    x1, y1, x2, y2 = box1
+    a1, b1, a2, b2 = box2
+    return max(0, min(x2, a2) - max(x1, a1)) * max(0, min(y2, b2) - max(y1, b1))
+
+def place_away_from_phones(text_layout, phone_boxes, safe_box):
+    """Keep the layout where it is unless it covers a phone, else try the top and bottom of the safe area."""
+    if not phone_boxes or not text_layout.positions:
+        return text_layout
+    block_height = text_layout.block_box()[3] - text_layout.block_box()[1]
+    candidates = [
+        text_layout,
+        text_layout.moved_to(safe_box[1]),
+        text_layout.moved_to(max(safe_box[1], safe_box[3] - block_height)),
+        text_layout.moved_to(100),
+    ]
+
+    def covered(candidate):
+        return sum(overlap_area(candidate.block_box(), box) for box in phone_boxes)
+
+    return min(candidates, key=covered)
+
 def draw_iphone_boxes(image, box, color=(128, 0, 128), width=4):
     """Draw rectangles around given boxes on the image."""
     print('Draw Iphone Box')
@@ -113,6 +126,8 @@ def download_font_from_drive(service, folder_id, temp_dir="temp"):
 
     os.makedirs(temp_dir, exist_ok=True)
     request = service.files().get_media(fileId=file_id)
+    import requests
+
     response = requests.get(
         f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media",
         headers={"Authorization": f"Bearer {service._http.credentials.token}"}
@@ -126,147 +141,191 @@ def get_font_size(char_count, base_chars=80, base_size=80, min_size=60):
     ratio = base_chars / char_count if char_count > base_chars else 1
     return max(int(base_size * ratio), min_size)
 
-def process_carousel(layout, image_paths, font_path, config, font_colors, slide_texts):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_dir = f"temp/carousel_{timestamp}"
-    os.makedirs(output_dir, exist_ok=True)
+def place_in_calm_band(text_layout, img, phone_boxes, safe_box, stride=8):
+    """Move the block to the full-width band of the safe area with the calmest mid-tone background."""
+    left, top, right, bottom = text_layout.block_box()
+    region = find_best_text_region(
+        img,
+        avoid_boxes=phone_boxes,
+        box_size=(safe_box[2] - safe_box[0], bottom - top),
+        stride=stride,
+        allowed_box=safe_box
+    )
+    if region is None:
+        return None
+    return text_layout.moved_to(region[1])
+
+def render_slide(index, image_path, text, font_path, config, font_color, phone_boxes=None, layout=None):
+    """
+    Render one slide to an RGB image, or None when its text could not be laid out.
+
+    phone_boxes are detections in source pixels; None means detection was not run.
+    layout "auto" places the text by the brightness/contrast heatmap instead of fixed positions.
+    """
+    i = index
+    width = config.get("output_width", 1080)
+    height = config.get("output_height", 1920)
+    # Already fitted to the output size, it covers the whole slide so there is no separate canvas
+    img, source_size = get_background_cache(config).get(image_path, (width, height))
+
+    if text:
+        safe_box = get_tiktok_safe_area(width, height)
+        # img = draw_safe_area_outline(img, safe_box)
+
+        auto_layout = layout == "auto"
+        if phone_boxes is None and not auto_layout:
+            # No detections: every 4th image is assumed to be an iphone image, use a fixed text position
+            is_iphone_slide = (i + 1) % 4 == 0
+            fitted_boxes = []
+        else:
+            is_iphone_slide = False
+            fitted_boxes = [b for b in (fit_box(box, source_size, (width, height)) for box in phone_boxes or []) if b]
+        try:
+            text_layout = fit_text(
+                text,
+                font_path,
+                safe_box,
+                start_size=get_font_size(len(text)),
+                min_size=60,
+                top=100 if is_iphone_slide else None
+            )
+        except Exception as e:
+            print(f"❌ Failed to lay out text on slide {i+1}: {e}")
+            return None
+
+        placed = None
+        if auto_layout and text_layout.positions:
+            placed = place_in_calm_band(text_layout, img, fitted_boxes, safe_box, config.get("heatmap_stride", 8))
+            if placed is not None:
+                text_layout = placed
+                print(f"🗺️ Slide {i+1}: heatmap placed text at y={text_layout.positions[0][1]}")
+        if placed is None and fitted_boxes and text_layout.positions:
+            text_layout = place_away_from_phones(text_layout, fitted_boxes, safe_box)
+            print(f"📱 Slide {i+1}: {len(fitted_boxes)} phone(s) detected — text at y={text_layout.positions[0][1]}")
+
+        if not text_layout.fits:
+            print(f"⚠️ Slide {i+1}: text too tall to fit even at 60px. Rendering anyway at minimum font size.")
+        if is_iphone_slide:
+            print(f"📌 Slide {i+1} is iPhone layout — using static position (y=100)")
+        print(f"📝 Drawing text on slide {i+1} (font size: {text_layout.font_size}): {text}")
+
+        fill_color = hex_to_rgb(font_color)
+        placements = [
+            (position, line.replace('"', '').replace("'", ""))
+            for position, line in text_layout.placements()
+        ]
+        img = draw_glow_text_block(
+            img,
+            placements,
+            font=text_layout.font,
+            fill=fill_color,
+            glow_color=config.get("glow_color", "#FF4EDB"),
+            glow_radius=config.get("glow_radius", 10),
+            blur_radius=config.get("glow_blur_radius", 8)
+        )
+
+        # 📌 Add font size reference
+        # debug_font = ImageFont.truetype(font_path, 30)
+        # debug_text = f"Font size: {text_layout.font_size}px"
+        # img_draw = ImageDraw.Draw(img)
+        # img_draw.text((safe_box[0], safe_box[1] - 40), debug_text, font=debug_font, fill=(255, 255, 255, 255))
+
+    return img.convert("RGB")
+
+def render_slide_to_file(index, image_path, text, font_color, output_path, phone_boxes=None, layout=None, font_path=None, config=None):
+    img = render_slide(index, image_path, text, font_path, config, font_color, phone_boxes, layout)
+    if img is None:
+        return None
+    print(f"🔍 About to save: {output_path}")
+    save_slide(img, output_path, config.get("encoder_preset", "default"))
+    print(f"✅ Processed slide {index+1}: {output_path} (size={os.path.getsize(output_path)} bytes)")
+    return output_path
+
+def render_slide_to_bytes(index, image_path, text, font_color, name, phone_boxes=None, layout=None, font_path=None, config=None):
+    """Same as render_slide_to_file but returns (name, jpeg_bytes) without touching disk."""
+    img = render_slide(index, image_path, text, font_path, config, font_color, phone_boxes, layout)
+    if img is None:
+        return None
+    data = encode_slide(img, config.get("encoder_preset", "default"))
+    print(f"✅ Processed slide {index+1}: {name} in memory (size={len(data)} bytes)")
+    return name, data
 
-    # Load font
+def load_carousel_font(font_path, config):
     font_size = config.get("font_size", 120)  # Increased size for visibility
     font = None
     if font_path and os.path.exists(font_path):
         try:
-            font = ImageFont.truetype(font_path, font_size)
+            font = get_registry().font(font_path, font_size)
             print(f"✅ Font loaded successfully from {font_path}")
         except Exception as e:
             print(f"❌ Font loading error from {font_path}: {str(e)}")
     if not font:
         print("⚠️ No valid font available, saving images without text")
-
+    return font
+
+def carousel_jobs(layout, image_paths, font_colors, slide_texts, phone_boxes, target):
+    """
+    (index, image_path, text, font_color, target(i), phone_boxes, layout) per slide with an image:
+    small enough to send to a worker process. target gives the output path or in-memory name.
+    """
+    jobs = []
     for i, image_path in enumerate(image_paths):
         if image_path and os.path.exists(image_path):
-            base_img = Image.open(image_path)
-            width = config.get("output_width", 1080)
-            height = config.get("output_height", 1920)
-            base_img = ImageOps.fit(base_img, (width, height), Image.Resampling.LANCZOS, centering=(0.5, 0.5))
-            base_img = base_img.convert("RGBA")
-
-            img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-            img.paste(base_img, (0, 0))
-
-            if i < len(slide_texts) and slide_texts[i]:
-                text = slide_texts[i]
-                font_size = get_font_size(len(text))
-                try:
-                    font = ImageFont.truetype(font_path, font_size)
-                except Exception as e:
-                    print(f"❌ Failed to load font at size {font_size}: {e}")
-                    continue
-
-                print(f"📝 Drawing text on slide {i+1} (font size: {font_size}): {text}")
-                margin = 50
-                safe_box = get_tiktok_safe_area(width, height)
-                # img = draw_safe_area_outline(img, safe_box)
-
-                safe_left = safe_box[0]
-                safe_top = safe_box[1]
-                safe_right = safe_box[2]
-                safe_bottom = safe_box[3]
-                max_width = safe_right - safe_left
-                max_height = safe_bottom - safe_top
-
-                draw = ImageDraw.Draw(img)
-                line_spacing = 10
-
-                # Dynamically wrap text by pixel width, adjusting font size down if needed
-                min_font_size = 60
-                while True:
-                    font = ImageFont.truetype(font_path, font_size)
-                    lines = []
-                    current_line = ""
-                    for word in text.split():
-                        test_line = current_line + (" " if current_line else "") + word
-                        bbox = draw.textbbox((0, 0), test_line, font=font)
-                        if bbox[2] - bbox[0] <= max_width:
-                            current_line = test_line
-                        else:
-                            lines.append(current_line)
-                            current_line = word
-                    if current_line:
-                        lines.append(current_line)
-
-                    line_height = font.getbbox("Ay")[3] - font.getbbox("Ay")[1]
-                    total_height = len(lines) * (line_height + line_spacing)
-
-                    # 🔒 Enforce minimum font size of 60
-                    if total_height <= max_height:
-                        break
-                    if font_size <= min_font_size:
-                        print(f"⚠️ Slide {i+1}: text too tall to fit even at 60px. Rendering anyway at minimum font size.")
-                        font_size = min_font_size
-                        font = ImageFont.truetype(font_path, font_size)
-                        break
-
-                    font_size -= 2
-
-                # y_text = max(safe_top, (safe_top + safe_bottom - total_height) // 2)
-                # If this is every 4th image (iphone image), use fixed text position away from phone
-                if (i + 1) % 4 == 0:
-                    # Static position in top-left (adjust as needed)
-                    x_text = 80
-                    y_text = 100
-                    print(f"📌 Slide {i+1} is iPhone layout — using static position (x={x_text}, y={y_text})")
-                else:
-                    y_text = max(safe_top, (safe_top + safe_bottom - total_height) // 2)
-
-
-
-                fill_color = hex_to_rgb(font_colors[i] if i < len(font_colors) else "#FFFFFF")
-                for line in lines:
-                    draw = ImageDraw.Draw(img)
-                    bbox = draw.textbbox((0, 0), line, font=font)
-                    text_width = bbox[2] - bbox[0]
-                    # x_text = max(margin, (width - text_width) // 2)
-                    max_width = safe_right - safe_left
-                    x_text = safe_left + (max_width - text_width) // 2
-                    line = line.replace('"', '').replace("'", "") 
-                    img = draw_soft_glow_text(
-                        img,
-                        (x_text, y_text),
-                        line,
-                        font=font,
-                        fill=fill_color,
-                        glow_color="#FF4EDB"
-                    )
-                    line_spacing = 20 
-                    y_text += line_height + line_spacing
-
-                    # 📌 Add font size reference
-                    # debug_font = ImageFont.truetype(font_path, 30)
-                    # debug_text = f"Font size: {font_size}px"
-                    # img_draw = ImageDraw.Draw(img)
-                    # img_draw.text((safe_left, safe_top - 40), debug_text, font=debug_font, fill=(255, 255, 255, 255))
-
-
-            output_path = os.path.join(output_dir, f"slide{i+1}.jpg")
-            img = img.convert("RGB")
-            print(f"🔍 About to save: {output_path}")
-            img.save(output_path, "JPEG", quality=95)
-            print(f"✅ Processed slide {i+1}: {output_path} (size={os.path.getsize(output_path)} bytes)")
+            jobs.append((
+                i,
+                image_path,
+                slide_texts[i] if i < len(slide_texts) else None,
+                font_colors[i] if i < len(font_colors) else "#FFFFFF",
+                target(i),
+                phone_boxes[i] if phone_boxes is not None else None,
+                layout
+            ))
+    return jobs
+
+def process_carousel(layout, image_paths, font_path, config, font_colors, slide_texts, render_pool=None, phone_boxes=None, output_dir=None):
+    if output_dir is None:
+        # Microseconds keep carousels rendered in the same second (and still uploading) apart
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        output_dir = f"temp/carousel_{timestamp}"
+    os.makedirs(output_dir, exist_ok=True)
+
+    load_carousel_font(font_path, config)
+    jobs = carousel_jobs(
+        layout, image_paths, font_colors, slide_texts, phone_boxes,
+        lambda i: os.path.join(output_dir, f"slide{i+1}.jpg")
+    )
+
+    if render_pool is not None and render_pool.font_path == font_path:
+        render_pool.render(jobs)
+    else:
+        for job in jobs:
+            render_slide_to_file(*job, font_path=font_path, config=config)
 
     print(f"✅ Carousel ready at {output_dir}")
     return output_dir
 
+def render_carousel(layout, image_paths, font_path, config, font_colors, slide_texts, render_pool=None, phone_boxes=None):
+    """process_carousel without temp files: returns [(name, jpeg_bytes)] in slide order, ready for Uploader.submit_buffers."""
+    load_carousel_font(font_path, config)
+    jobs = carousel_jobs(layout, image_paths, font_colors, slide_texts, phone_boxes, lambda i: f"slide{i+1}.jpg")
+
+    if render_pool is not None and render_pool.font_path == font_path:
+        slides = render_pool.render_bytes(jobs)
+    else:
+        slides = [render_slide_to_bytes(*job, font_path=font_path, config=config) for job in jobs]
+
+    slides = [slide for slide in slides if slide is not None]
+    print(f"✅ Carousel ready in memory ({len(slides)} slides, {sum(len(data) for _, data in slides)} bytes)")
+    return slides
+
 if __name__ == "__main__":
+    import yaml
+
     with open("config.yaml", "r") as f:
         config = yaml.safe_load(f)
 
     # Google Drive Font Setup
-    creds = service_account.Credentials.from_service_account_file(
-        "credentials.json",
-        scopes=["https://www.googleapis.com/auth/drive.readonly"]
-    )
-    drive_service = build("drive", "v3", credentials=creds)
+    drive_service = google_clients.drive()
 
     font_folder_id = "1mwenttTQ04TKdd0EMIfotO7CyucQDkuF"
     font_path = download_font_from_drive(drive_service, font_folder_id)
@@ -0,0 +1,112 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from modules.workspace import pid_alive
+
+JOB_QUEUE_PATH = os.path.join("cache", "jobs.sqlite3")
+JOB_KINDS = ("sheet", "rows")
+
+
+class JobQueue:
+    """
+    SQLite table of jobs for `main.py --daemon`. Any process can submit, the daemon claims
+    the oldest queued job, and a job still marked running by a dead daemon is queued again.
+
+    Kinds: "sheet" re-reads the spreadsheet and renders its new rows, "rows" renders
+    the rows in the payload ({"rows": [[text, ...], ...], "prompt": optional}) without a sheet read.
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Autocommit, so claim() can take the write lock itself with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, payload TEXT, status TEXT,"
+            " worker_pid INTEGER, submitted_at REAL, started_at REAL, finished_at REAL,"
+            " result TEXT, error TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+
+    def submit(self, kind, payload=None):
+        if kind not in JOB_KINDS:
+            raise ValueError(f"❌ Unknown job kind {kind!r}, expected one of {JOB_KINDS}")
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO jobs (kind, payload, status, submitted_at) VALUES (?, ?, 'queued', ?)",
+                (kind, json.dumps(payload or {}, ensure_ascii=False), time.time())
+            )
+        return cursor.lastrowid
+
+    def claim(self, pid=None):
+        """Oldest queued job as a dict, now marked running under pid, or None when the queue is empty."""
+        pid = pid or os.getpid()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, kind, payload, submitted_at FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', worker_pid = ?, started_at = ? WHERE id = ?",
+                        (pid, time.time(), row[0])
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row[0], "kind": row[1], "payload": json.loads(row[2]), "submitted_at": row[3]}
+
+    def complete(self, job_id, result=None):
+        self._finish(job_id, "done", result=json.dumps(result or {}, default=str))
+
+    def fail(self, job_id, error):
+        self._finish(job_id, "failed", error=str(error))
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE id = ?",
+                (status, time.time(), result, error, job_id)
+            )
+
+    def requeue_stale(self):
+        """Queue running jobs again whose daemon is gone, returning how many there were."""
+        with self._lock:
+            running = self._db.execute("SELECT id, worker_pid FROM jobs WHERE status = 'running'").fetchall()
+            stale = [(job_id,) for job_id, pid in running if pid is None or not pid_alive(pid)]
+            self._db.executemany(
+                "UPDATE jobs SET status = 'queued', worker_pid = NULL, started_at = NULL WHERE id = ?", stale
+            )
+        return len(stale)
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, status, submitted_at, started_at, finished_at, result, error FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "kind", "status", "submitted_at", "started_at", "finished_at", "result", "error")
+        job = dict(zip(keys, row))
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in ("queued", "running", "done", "failed")}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,9 +1,46 @@
+import json
 import os
-from openai import OpenAI
+import threading
 from dotenv import load_dotenv
+from modules.llm_cache import CachedOpenAI, get_llm_cache
+from modules.rate_limiter import scheduled_openai
+
+client = None
+_client_lock = threading.Lock()
+
+
+def make_openai_client(config, api_key=None):
+    """
+    OpenAI client, or with llm_backend: stub the offline StubOpenAI behind any
+    fault_injection settings for "openai". The openai package is only imported here.
+    """
+    if config.get("llm_backend", "openai") == "stub":
+        from modules.fake_api import flaky_openai
+        from modules.llm_stub import StubOpenAI
+        return flaky_openai(StubOpenAI(), config)
+    from openai import OpenAI
+    # The shared scheduler does all retrying, so it sees every 429 and can back off
+    return OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+
+def init(api_key=None, cache_mode=None, config=None):
+    """Build the shared client from config (see make_openai_client)."""
+    global client
+    load_dotenv()
+    client = CachedOpenAI(
+        scheduled_openai(make_openai_client(config or {}, api_key)),
+        get_llm_cache(),
+        mode=cache_mode or os.getenv("LLM_CACHE_MODE", "read-through")
+    )
+    return client
+
+
+def get_client():
+    with _client_lock:
+        if client is None:
+            init()
+    return client
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 def generate_unique_variations(slide_text, num_outputs, existing_variations=None, model="gpt-4"):
     if existing_variations is None:
@@ -26,11 +63,12 @@ Original:
 "{slide_text}"
 """
 
-        response = client.chat.completions.create(
+        response = get_client().chat.completions.create(
             model=model,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.75,
             max_tokens=200,
+            sample=attempts - 1,
         )
 
         output = response.choices[0].message.content.strip()
@@ -41,6 +79,105 @@ Original:
     return variations
 
 
+BATCH_INSTRUCTIONS = """Apply the instructions above to every phrase in the JSON input below.
+For each request, write exactly "count" new rewrites of its "phrase" that are all different
+from each other and from everything listed in its "avoid".
+
+Respond with JSON only, no commentary, in this exact shape:
+{"results": [{"id": <request id>, "variations": ["...", "..."]}]}
+
+Input JSON:
+"""
+
+
+def clean_variation(text):
+    return text.strip().replace('"', '') if isinstance(text, str) else ""
+
+
+def parse_json_response(content):
+    """Parse a JSON object out of a model reply, tolerating code fences or stray text around it."""
+    start, end = content.find("{"), content.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("no JSON object in response")
+    return json.loads(content[start:end + 1])
+
+
+def build_batch_prompt(prompt_template, requests):
+    instructions = prompt_template.replace("{original}", "<the phrase>")
+    return f"{instructions}\n\n{BATCH_INSTRUCTIONS}{json.dumps({'requests': requests}, ensure_ascii=False)}"
+
+
+def generate_variation_grid(strings, num_variations, prompt_template, llm_client=None, model="gpt-4", max_tokens=100, temperature=0.9, max_batch_attempts=3, max_cell_attempts=None):
+    """
+    Generate num_variations rewrites of every slide text, asking for the whole grid in one JSON reply.
+
+    Only missing or duplicate cells are asked for again, at most max_batch_attempts batch
+    requests in total, then the remaining cells fall back to one request per variation with
+    a hard cap. Returns [strings] + one list per variation, like main.generate_variations.
+    llm_client must accept sample=<attempt>, as CachedOpenAI does.
+    """
+    llm_client = llm_client or get_client()
+    grid = [[] for _ in strings]
+
+    def missing():
+        return [i for i, cell in enumerate(grid) if len(cell) < num_variations]
+
+    def add(i, text):
+        text = clean_variation(text)
+        if text and text != strings[i].strip() and text not in grid[i] and len(grid[i]) < num_variations:
+            grid[i].append(text)
+
+    for attempt in range(max_batch_attempts):
+        pending = missing()
+        if not pending:
+            break
+        requests = [
+            {"id": i, "phrase": strings[i], "count": num_variations - len(grid[i]), "avoid": grid[i]}
+            for i in pending
+        ]
+        try:
+            response = llm_client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": build_batch_prompt(prompt_template, requests)}],
+                temperature=temperature,
+                max_tokens=max_tokens * sum(r["count"] for r in requests) + 50 * len(requests),
+                sample=attempt
+            )
+            results = parse_json_response(response.choices[0].message.content).get("results", [])
+        except Exception as e:
+            print(f"⚠️ Batched variation request failed: {e}")
+            continue
+
+        for result in results if isinstance(results, list) else []:
+            if not isinstance(result, dict) or result.get("id") not in pending:
+                continue
+            variations = result.get("variations")
+            for text in variations if isinstance(variations, list) else []:
+                add(result["id"], text)
+
+    pending = missing()
+    if pending:
+        print(f"⚠️ Falling back to single requests for {len(pending)} slides")
+    for i in pending:
+        final_prompt = prompt_template.replace("{original}", strings[i])
+        cell_attempts = max_cell_attempts or num_variations * 3
+        for attempt in range(cell_attempts):
+            if len(grid[i]) >= num_variations:
+                break
+            response = llm_client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": final_prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                sample=attempt
+            )
+            add(i, response.choices[0].message.content)
+        if len(grid[i]) < num_variations:
+            raise RuntimeError(f"❌ Only got {len(grid[i])}/{num_variations} unique variations for slide {i+1}")
+
+    return [strings] + [[grid[i][v] for i in range(len(strings))] for v in range(num_variations)]
+
+
 # def chat_with_gpt_variations(slide_text: str, n: int, model="gpt-4", temperature=0.7, max_tokens=200):
 #     prompt_template = f"""Rewrite the following text in a tone that resonates with Gen Z women on TikTok.
 # It should be casual, punchy, and authentic — the kind of hook that would appear as text on a TikTok carousel.
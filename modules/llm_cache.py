@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+LLM_CACHE_PATH = os.path.join("cache", "llm_cache.sqlite3")
+CACHE_MODES = ("read-through", "refresh", "bypass")
+
+
+def chat_response(model, content, prompt_tokens=0, completion_tokens=0):
+    """Minimal object shaped like an openai ChatCompletion, as far as this repo reads it."""
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content), finish_reason="stop")],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens
+        )
+    )
+
+
+def request_key(model, messages, temperature, max_tokens, sample=0, **kwargs):
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature,
+         "max_tokens": max_tokens, "sample": sample, "extra": kwargs},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite store of completions with TTL, entry-count and byte-size eviction, and hit/token counters."""
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl_seconds=30 * 24 * 3600, max_entries=20000, max_bytes=50 * 1024 ** 2):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY, model TEXT, content TEXT,"
+            " prompt_tokens INTEGER, completion_tokens INTEGER,"
+            " created_at REAL, accessed_at REAL)"
+        )
+        self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT model, content, prompt_tokens, completion_tokens, created_at FROM completions WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds and now - row[4] > self.ttl_seconds:
+                self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._db.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            self.tokens_saved += row[2] + row[3]
+        return chat_response(row[0], row[1], row[2], row[3])
+
+    def put(self, key, response):
+        usage = getattr(response, "usage", None)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, getattr(response, "model", None), response.choices[0].message.content,
+                 getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0, now, now)
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        if self.ttl_seconds:
+            self._db.execute("DELETE FROM completions WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(content)), 0) FROM completions").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT key, LENGTH(content) FROM completions ORDER BY accessed_at").fetchall()
+        doomed = []
+        for key, length in rows:
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            size -= length or 0
+        self._db.executemany("DELETE FROM completions WHERE key = ?", doomed)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+class CachedOpenAI:
+    """
+    Wraps an OpenAI client so chat.completions.create goes through an LLMCache.
+
+    Callers retrying an identical request for a different answer pass sample=<attempt>,
+    so each attempt has its own slot and a repeated run replays the same sequence.
+    mode is "read-through" (serve hits, store misses), "refresh" (always call, store)
+    or "bypass" (no caching).
+    """
+
+    def __init__(self, client, cache, mode="read-through"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"❌ Unknown LLM cache mode {mode!r}, expected one of {CACHE_MODES}")
+        self.client = client
+        self.cache = cache
+        self.mode = mode
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, temperature=None, max_tokens=None, sample=0, **kwargs):
+        if self.mode == "bypass":
+            return self.client.chat.completions.create(
+                model=model, messages=messages, temperature=temperature, max_tokens=max_tokens, **kwargs
+            )
+
+        key = request_key(model, messages, temperature, max_tokens, sample=sample, **kwargs)
+
+        if self.mode == "read-through":
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = self.client.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, max_tokens=max_tokens, **kwargs
+        )
+        self.cache.put(key, response)
+        return response
+
+
+_default_cache = None
+
+
+def get_llm_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LLMCache()
+    return _default_cache
@@ -0,0 +1,40 @@
+import hashlib
+import json
+from types import SimpleNamespace
+
+from modules.llm import BATCH_INSTRUCTIONS
+from modules.llm_cache import chat_response
+
+OPENERS = ["Real talk:", "Quick tip:", "Honestly,", "Reminder:", "Hot take:", "Lowkey,"]
+
+
+class StubOpenAI:
+    """
+    Offline stand-in for the OpenAI client, answering chat.completions.create with
+    deterministic rewrites. Batched prompts get JSON in the shape generate_variation_grid asks for.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _rewrite(self, phrase, n):
+        digest = hashlib.sha1(f"{phrase}|{n}".encode("utf-8")).hexdigest()
+        return f"{OPENERS[int(digest[:2], 16) % len(OPENERS)]} {phrase.strip()} #{digest[:4]}"
+
+    def create(self, model, messages, temperature=None, max_tokens=None, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+
+        if BATCH_INSTRUCTIONS in prompt:
+            payload = json.loads(prompt.split(BATCH_INSTRUCTIONS, 1)[1])
+            results = []
+            for request in payload["requests"]:
+                offset = len(request.get("avoid", []))
+                variations = [self._rewrite(request["phrase"], offset + k) for k in range(request["count"])]
+                results.append({"id": request["id"], "variations": variations})
+            content = json.dumps({"results": results})
+        else:
+            content = self._rewrite(prompt, self.calls)
+
+        return chat_response(model, content, len(prompt) // 4, len(content) // 4)
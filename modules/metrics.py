@@ -0,0 +1,244 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+METRICS_DIR = "metrics"
+PROMETHEUS_PREFIX = "carousel_"
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _prom_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Metrics:
+    """
+    Counters, gauges and timings for one run, plus an optional JSON-lines event log.
+    Everything is keyed by name and labels, e.g. incr("api_calls_total", api="drive", method="download").
+    """
+
+    def __init__(self, events_path=None):
+        self.started = time.time()
+        self._counters = {}
+        self._gauges = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+        self._events = None
+        if events_path:
+            os.makedirs(os.path.dirname(events_path) or ".", exist_ok=True)
+            self._events = open(events_path, "a", encoding="utf-8")
+
+    def incr(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            timing = self._timings.setdefault(key, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def record_cache(self, cache, stats):
+        """Hit/miss gauges from a cache's stats() dict."""
+        for field in ("hits", "misses", "hit_rate", "tokens_saved"):
+            if field in stats:
+                self.gauge(f"cache_{field}", stats[field], cache=cache)
+
+    def event(self, name, **fields):
+        if self._events is None:
+            return
+        record = {"ts": datetime.now(timezone.utc).isoformat(), "event": name, **fields}
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._events.write(line + "\n")
+            self._events.flush()
+
+    def summary(self):
+        with self._lock:
+            return {
+                "started_at": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+                "duration_seconds": round(time.time() - self.started, 3),
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "gauges": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._gauges.items())
+                ],
+                "timings": [
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "count": count,
+                        "total_seconds": round(total, 6),
+                        "mean_seconds": round(total / count, 6) if count else 0.0,
+                        "max_seconds": round(longest, 6),
+                    }
+                    for (name, labels), (count, total, longest) in sorted(self._timings.items())
+                ],
+            }
+
+    def prometheus_text(self, prefix=PROMETHEUS_PREFIX):
+        """Node exporter textfile format: counters, gauges and each timing as a summary plus a _max gauge."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            timings = sorted(self._timings.items())
+
+        def block(kind, items, suffix=""):
+            declared = set()
+            for (name, labels), value in items:
+                metric = f"{prefix}{name}{suffix}"
+                if metric not in declared:
+                    lines.append(f"# TYPE {metric} {kind}")
+                    declared.add(metric)
+                lines.append(f"{metric}{_prom_labels(labels)} {value}")
+
+        block("counter", counters)
+        block("gauge", gauges)
+        declared = set()
+        for (name, labels), (count, total, _) in timings:
+            metric = f"{prefix}{name}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} summary")
+                declared.add(metric)
+            lines.append(f"{metric}_count{_prom_labels(labels)} {count}")
+            lines.append(f"{metric}_sum{_prom_labels(labels)} {total}")
+        block("gauge", [((name, labels), t[2]) for (name, labels), t in timings], "_max")
+        lines.append(f"# TYPE {prefix}run_duration_seconds gauge")
+        lines.append(f"{prefix}run_duration_seconds {time.time() - self.started}")
+        return "\n".join(lines) + "\n"
+
+    def _write(self, path, text):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Rename into place so a textfile collector never reads a half-written file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def write_json(self, path):
+        self._write(path, json.dumps(self.summary(), indent=2, default=str))
+
+    def write_prometheus(self, path):
+        self._write(path, self.prometheus_text())
+
+    def close(self):
+        if self._events is not None:
+            self._events.close()
+            self._events = None
+
+
+class Instrumented:
+    """
+    Proxy that counts and times every method call on target as api_calls_total and
+    api_call_seconds labelled {api, method}. measure(metrics, method, args, kwargs, result)
+    can record more from successful calls, e.g. bytes moved or tokens used.
+    """
+
+    def __init__(self, target, api, metrics=None, measure=None):
+        self._target = target
+        self._api = api
+        self._metrics = metrics
+        self._measure = measure
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            metrics = self._metrics or get_metrics()
+            start = time.perf_counter()
+            status = "error"
+            try:
+                result = attr(*args, **kwargs)
+                status = "ok"
+            finally:
+                elapsed = time.perf_counter() - start
+                metrics.incr("api_calls_total", api=self._api, method=name, status=status)
+                metrics.observe("api_call_seconds", elapsed, api=self._api, method=name)
+            if self._measure is not None:
+                self._measure(metrics, name, args, kwargs, result)
+            return result
+
+        return call
+
+
+def drive_transfer(metrics, method, args, kwargs, result):
+    """Bytes moved by DriveBackend.download(file_id, fh) and upload_file(name, parent_id, fh, mime_type)."""
+    if method == "download":
+        fh, direction = kwargs.get("fh", args[1] if len(args) > 1 else None), "download"
+    elif method == "upload_file":
+        fh, direction = kwargs.get("fh", args[2] if len(args) > 2 else None), "upload"
+    else:
+        return
+    if fh is not None and hasattr(fh, "tell"):
+        metrics.incr("bytes_total", fh.tell(), api="drive", direction=direction)
+
+
+def openai_usage(metrics, method, args, kwargs, result):
+    usage = getattr(result, "usage", None)
+    if usage is None:
+        return
+    model = kwargs.get("model", "unknown")
+    metrics.incr("llm_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, kind="prompt", model=model)
+    metrics.incr("llm_tokens_total", getattr(usage, "completion_tokens", 0) or 0, kind="completion", model=model)
+
+
+def instrument_openai(client, metrics=None):
+    """Client whose chat.completions.create is counted, timed and token-metered under api="openai"."""
+    completions = Instrumented(client.chat.completions, "openai", metrics, measure=openai_usage)
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+    return _metrics
+
+
+def configure_metrics(events_path=None):
+    """Replace the process-wide Metrics, e.g. to start logging events to a file."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is not None:
+            _metrics.close()
+        _metrics = Metrics(events_path)
+    return _metrics
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import threading
+
+from PIL import Image
+
+from modules.background_cache import fit_crop
+
+DETECTION_CACHE_PATH = os.path.join("cache", "phone_detections.json")
+MODEL_PATH = "yolov8n.pt"
+
+
+def fit_box(box, src_size, dst_size, centering=(0.5, 0.5)):
+    """Map a box from source pixels into the ImageOps.fit(src, dst_size) frame, None if it is cropped away."""
+    dst_w, dst_h = dst_size
+    crop_left, crop_top, crop_right, _ = fit_crop(src_size, dst_size, centering)
+    scale = dst_w / (crop_right - crop_left)
+
+    x1, y1, x2, y2 = box
+    mapped = (
+        max(0, int((x1 - crop_left) * scale)),
+        max(0, int((y1 - crop_top) * scale)),
+        min(dst_w, int((x2 - crop_left) * scale)),
+        min(dst_h, int((y2 - crop_top) * scale)),
+    )
+    if mapped[2] <= mapped[0] or mapped[3] <= mapped[1]:
+        return None
+    return mapped
+
+
+class PhoneDetector:
+    """
+    YOLO "cell phone" detector loaded once per process. Images are analysed in batches on
+    the CPU and the boxes are cached on disk by content hash, so each background is only
+    ever analysed once.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, cache_path=DETECTION_CACHE_PATH, batch_size=8, device="cpu"):
+        self.model_path = model_path
+        self.cache_path = cache_path
+        self.batch_size = batch_size
+        self.device = device
+        self._model = None
+        self._lock = threading.Lock()
+        self._cache = {}
+        if os.path.exists(cache_path):
+            with open(cache_path, "r") as f:
+                self._cache = json.load(f)
+
+    def model(self):
+        if self._model is None:
+            from ultralytics import YOLO
+            self._model = YOLO(self.model_path)  # Make sure this model file is downloaded
+        return self._model
+
+    @staticmethod
+    def content_hash(image_path):
+        with open(image_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def detect(self, image_paths):
+        """Phone boxes (x1, y1, x2, y2) in source pixels for each path, in order."""
+        keys = [self.content_hash(path) for path in image_paths]
+        with self._lock:
+            pending = [(key, path) for key, path in zip(keys, image_paths) if key not in self._cache]
+            pending = list(dict(pending).items())
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start:start + self.batch_size]
+                for (key, _), boxes in zip(batch, self._infer([path for _, path in batch])):
+                    self._cache[key] = boxes
+            if pending:
+                self._save()
+            return [[tuple(box) for box in self._cache[key]] for key in keys]
+
+    def _infer(self, image_paths):
+        # PIL images, not paths, so boxes share the un-rotated frame ImageOps.fit works in
+        images = []
+        for path in image_paths:
+            with Image.open(path) as img:
+                images.append(img.convert("RGB"))
+
+        results = self.model()(images, device=self.device, verbose=False)
+        detections = []
+        for r in results:
+            boxes = []
+            for box in r.boxes:
+                cls_id = int(box.cls[0])
+                label = r.names[cls_id]
+                if label.lower() == "cell phone":
+                    x1, y1, x2, y2 = map(int, box.xyxy[0])
+                    boxes.append([x1, y1, x2, y2])
+            detections.append(boxes)
+        return detections
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._cache, f)
+        os.replace(tmp_path, self.cache_path)
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_detector():
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            _detector = PhoneDetector()
+    return _detector
@@ -0,0 +1,140 @@
+import queue
+import threading
+import time
+import traceback
+
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline. fn takes an item and returns the next item, None to drop it,
+    or (with fan_out=True) an iterable of items. Each stage runs `workers` threads and
+    blocks on a queue of at most queue_size items, which is what gives backpressure.
+    """
+
+    def __init__(self, name, fn, workers=1, queue_size=4, fan_out=False):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.fan_out = fan_out
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+
+class StageError:
+    def __init__(self, stage, item, exc):
+        self.stage = stage
+        self.item = item
+        self.exc = exc
+        self.traceback = traceback.format_exc()
+
+    def __repr__(self):
+        return f"StageError({self.stage!r}, {self.exc!r})"
+
+
+class Pipeline:
+    """
+    Runs items through stages connected by bounded queues, so every stage works at once.
+    With a Metrics object every item's wall time is recorded as stage_item_seconds{stage}.
+    """
+
+    def __init__(self, stages, metrics=None):
+        self.stages = stages
+        self.errors = []
+        self.metrics = metrics
+        self._lock = threading.Lock()
+
+    def _worker(self, stage, inbox, outbox, remaining):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                # Let sibling workers see the sentinel too, the last one out closes the next queue
+                inbox.put(_DONE)
+                with self._lock:
+                    remaining[stage.name] -= 1
+                    last = remaining[stage.name] == 0
+                if last:
+                    outbox.put(_DONE)
+                return
+
+            start = time.perf_counter()
+            error = None
+            try:
+                result = stage.fn(item)
+                outputs = (result or []) if stage.fan_out else ([] if result is None else [result])
+                outputs = list(outputs)
+                with self._lock:
+                    stage.processed += 1
+            except Exception as e:
+                print(f"❌ Stage {stage.name} failed: {e}")
+                error = e
+                outputs = []
+                with self._lock:
+                    stage.failed += 1
+                    self.errors.append(StageError(stage.name, item, e))
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    stage.busy_seconds += elapsed
+
+            if self.metrics is not None:
+                status = "ok" if error is None else "error"
+                self.metrics.observe("stage_item_seconds", elapsed, stage=stage.name)
+                self.metrics.incr("stage_items_total", stage=stage.name, status=status)
+                self.metrics.event("stage_item", stage=stage.name, seconds=round(elapsed, 6), status=status,
+                                   outputs=len(outputs), error=None if error is None else repr(error))
+
+            for output in outputs:
+                outbox.put(output)
+
+    def run(self, items):
+        """Feed items in and return everything the last stage produced, in completion order."""
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        queues.append(queue.Queue())
+        remaining = {stage.name: stage.workers for stage in self.stages}
+
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(stage, queues[index], queues[index + 1], remaining),
+                    name=f"{stage.name}-{n}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        def feed():
+            for item in items:
+                queues[0].put(item)
+            queues[0].put(_DONE)
+
+        feeder = threading.Thread(target=feed, name="feeder", daemon=True)
+        feeder.start()
+
+        results = []
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                break
+            results.append(item)
+
+        feeder.join()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def summary(self):
+        return {
+            stage.name: {
+                "workers": stage.workers,
+                "processed": stage.processed,
+                "failed": stage.failed,
+                "busy_seconds": round(stage.busy_seconds, 3),
+            }
+            for stage in self.stages
+        }
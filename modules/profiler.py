@@ -0,0 +1,158 @@
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+PROFILE_DIR = "profiles"
+PROFILE_MODES = ("cpu", "alloc", "both")
+# Friendlier names for pipeline stages
+STAGE_ALIASES = {"llm": "generate", "download": "fetch", "drive": "fetch"}
+
+
+def parse_stages(value):
+    """'render, llm' or ['render', 'llm'] -> {'render', 'generate'}"""
+    if not value:
+        return set()
+    if isinstance(value, str):
+        value = value.split(",")
+    return {STAGE_ALIASES.get(name.strip(), name.strip()) for name in value if name.strip()}
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StageProfiler:
+    """
+    Profiles only the named pipeline stages or sections.
+
+    cpu: a sampler thread records the Python stack of every thread currently inside a
+    profiled stage every `interval` seconds; each stage gets a collapsed-stack file
+    (flamegraph.pl, speedscope, inferno). Sampling sees every worker thread of a stage,
+    which a per-thread cProfile cannot do.
+    alloc: tracemalloc snapshots around each item; each stage gets its top allocation sites.
+    Stages that are not named run their functions unwrapped, so the off path costs nothing.
+    """
+
+    def __init__(self, stages=(), mode="cpu", out_dir=PROFILE_DIR, interval=0.005, top=40):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"❌ Unknown profile mode {mode!r}, expected one of {PROFILE_MODES}")
+        self.stages = parse_stages(stages)
+        self.mode = mode
+        self.cpu = mode in ("cpu", "both")
+        self.alloc = mode in ("alloc", "both")
+        self.out_dir = out_dir
+        self.interval = interval
+        self.top = top
+        self._active = {}
+        self._stacks = {}
+        self._allocations = {}
+        self._items = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._started_tracemalloc = False
+
+    def enabled(self, stage):
+        return stage in self.stages
+
+    def start(self):
+        if not self.stages:
+            return
+        if self.alloc and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self._started_tracemalloc = True
+        if self.cpu:
+            self._sampler = threading.Thread(target=self._sample, name="stage-profiler", daemon=True)
+            self._sampler.start()
+        print(f"🔬 Profiling {', '.join(sorted(self.stages))} ({self.mode})")
+
+    def wrap(self, stage, fn):
+        """fn itself when the stage is not profiled, else fn run inside the profiler."""
+        if not self.enabled(stage):
+            return fn
+
+        def profiled(item):
+            with self._profiling(stage):
+                return fn(item)
+        return profiled
+
+    def section(self, name):
+        """Context manager for code outside the pipeline, e.g. profiler.section("catalog")."""
+        return self._profiling(name) if self.enabled(name) else nullcontext()
+
+    @contextmanager
+    def _profiling(self, stage):
+        ident = threading.get_ident()
+        before = tracemalloc.take_snapshot() if self.alloc else None
+        with self._lock:
+            previous = self._active.get(ident)
+            self._active[ident] = stage
+            self._items[stage] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                if previous is None:
+                    self._active.pop(ident, None)
+                else:
+                    self._active[ident] = previous
+            if before is not None:
+                # Other threads allocate meanwhile, so concurrent stages blur into each other
+                diff = tracemalloc.take_snapshot().compare_to(before, "lineno")
+                with self._lock:
+                    sites = self._allocations.setdefault(stage, Counter())
+                    for stat in diff:
+                        if stat.size_diff > 0:
+                            sites[str(stat.traceback[0])] += stat.size_diff
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                active = list(self._active.items())
+            for ident, stage in active:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    with self._lock:
+                        self._stacks.setdefault(stage, Counter())[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        """Stop sampling and write one file per profiled stage, returning their paths."""
+        if not self.stages:
+            return []
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        peak = tracemalloc.get_traced_memory()[1] if self.alloc else None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        run_dir = os.path.join(self.out_dir, datetime.now().strftime("%Y%m%d_%H%M%S"))
+        os.makedirs(run_dir, exist_ok=True)
+        paths = []
+        for stage in sorted(self.stages):
+            if self.cpu and stage in self._stacks:
+                path = os.path.join(run_dir, f"{stage}.collapsed")
+                with open(path, "w", encoding="utf-8") as f:
+                    for stack, count in self._stacks[stage].most_common():
+                        f.write(f"{stack} {count}\n")
+                paths.append(path)
+            if self.alloc and stage in self._allocations:
+                path = os.path.join(run_dir, f"{stage}.alloc.txt")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(f"# {stage}: {self._items[stage]} items, traced peak {peak} bytes\n")
+                    for site, size in self._allocations[stage].most_common(self.top):
+                        f.write(f"{size:>12} {site}\n")
+                paths.append(path)
+        for path in paths:
+            print(f"🔬 Wrote {path}")
+        return paths
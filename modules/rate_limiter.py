@@ -0,0 +1,224 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from modules.metrics import get_metrics
+
+# Starting points under the default quotas; override per API with rate_limits in config.yaml
+DEFAULT_LIMITS = {
+    "drive": {"rate": 100, "burst": 100, "concurrency": 16},
+    "sheets": {"rate": 1, "burst": 5, "concurrency": 2},
+    "openai": {"rate": 5, "burst": 10, "concurrency": 4},
+}
+
+
+def retry_after(exc):
+    """Seconds from a Retry-After header on a googleapiclient/openai error, if there is one."""
+    headers = getattr(exc, "headers", None)
+    if headers is None:
+        headers = getattr(exc, "resp", None)
+    if headers is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+    if headers is None:
+        return None
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        return float(value) if value is not None else None
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """`rate` calls per second with bursts of up to `burst`. rate None means unlimited."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate or 1.0)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.rate is None:
+                    return
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+    def block_for(self, seconds):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+            # Nothing refills while blocked
+            self.tokens = 0
+            self.updated = self.blocked_until
+
+
+class ApiLimiter:
+    """
+    Token bucket plus a concurrency cap for one API, adjusted AIMD style: every 429 halves
+    the rate (down to min_rate) and every success adds back a small step, up to max_rate,
+    so shared workers settle just under the quota instead of throttling each other.
+    """
+
+    def __init__(self, name, rate=None, burst=None, concurrency=None, max_rate=None, min_rate=0.2,
+                 decrease=0.5, increase=None, clock=time.monotonic, sleep=time.sleep):
+        self.name = name
+        self.max_rate = max_rate or rate
+        self.min_rate = min_rate
+        self.decrease = decrease
+        self.increase = increase if increase is not None else (rate or 0) / 20
+        self.bucket = TokenBucket(rate, burst, clock, sleep)
+        self._slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    @contextmanager
+    def slot(self):
+        if self._slots is not None:
+            self._slots.acquire()
+        try:
+            self.bucket.acquire()
+            with self._lock:
+                self.calls += 1
+            yield
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+    def on_success(self):
+        with self._lock:
+            if self.bucket.rate is not None and self.max_rate:
+                self.bucket.rate = min(self.max_rate, self.bucket.rate + self.increase)
+
+    def on_throttle(self, wait=None):
+        with self._lock:
+            self.throttled += 1
+            if self.bucket.rate is not None:
+                self.bucket.rate = max(self.min_rate, self.bucket.rate * self.decrease)
+        if wait:
+            self.bucket.block_for(wait)
+
+
+class CallScheduler:
+    """
+    Shared entry point for API calls: waits for the API's limiter, retries transient errors
+    with jittered exponential backoff (at least Retry-After) and feeds 429s back into the limiter.
+    clock, sleep and rng can be swapped for fakes.
+    """
+
+    def __init__(self, limits=None, clock=time.monotonic, sleep=time.sleep, rng=None):
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.retries = 0
+        self._limiters = {
+            name: ApiLimiter(name, clock=clock, sleep=sleep, **settings)
+            for name, settings in (limits or {}).items()
+        }
+
+    def limiter(self, api):
+        return self._limiters.get(api)
+
+    def call(self, api, fn, attempts=4, base_delay=0.5, max_delay=8.0):
+        # Imported here, modules.utils builds its retry helper on this scheduler
+        from modules.utils import error_status, is_transient_error
+
+        limiter = self.limiter(api)
+        for attempt in range(attempts):
+            try:
+                if limiter is None:
+                    result = fn()
+                else:
+                    with limiter.slot():
+                        result = fn()
+            except Exception as e:
+                wait = retry_after(e)
+                if limiter is not None and error_status(e) == 429:
+                    limiter.on_throttle(wait)
+                    get_metrics().incr("api_throttled_total", api=api)
+                if attempt == attempts - 1 or not is_transient_error(e):
+                    raise
+                delay = min(max_delay, base_delay * 2 ** attempt)
+                self.retries += 1
+                get_metrics().incr("api_retries_total", api=api or "other")
+                self.sleep(max(self.rng.uniform(delay / 2, delay), wait or 0))
+                continue
+            if limiter is not None:
+                limiter.on_success()
+            return result
+
+    def stats(self):
+        return {
+            name: {"calls": limiter.calls, "throttled": limiter.throttled, "rate": limiter.rate}
+            for name, limiter in self._limiters.items()
+        }
+
+
+class Scheduled:
+    """Proxy whose method calls all go through scheduler.call(api, ...). Only for calls that are safe to repeat."""
+
+    def __init__(self, target, api, scheduler=None, attempts=4):
+        self._target = target
+        self._api = api
+        self._scheduler = scheduler
+        self._attempts = attempts
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            scheduler = self._scheduler or get_scheduler()
+            return scheduler.call(self._api, lambda: attr(*args, **kwargs), attempts=self._attempts)
+
+        return call
+
+
+def scheduled_openai(client, scheduler=None):
+    """Client whose chat.completions.create is rate limited and retried under api="openai"."""
+    completions = Scheduled(client.chat.completions, "openai", scheduler)
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = CallScheduler(DEFAULT_LIMITS)
+    return _scheduler
+
+
+def configure_scheduler(limits=None):
+    """Replace the shared scheduler, rate_limits from config.yaml merged over DEFAULT_LIMITS."""
+    global _scheduler
+    merged = {name: dict(settings) for name, settings in DEFAULT_LIMITS.items()}
+    for name, settings in (limits or {}).items():
+        merged.setdefault(name, {}).update(settings or {})
+    with _scheduler_lock:
+        _scheduler = CallScheduler(merged)
+    return _scheduler
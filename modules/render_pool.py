@@ -0,0 +1,61 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from modules.font_registry import get_registry
+from modules.image_handler import render_slide_to_bytes, render_slide_to_file
+
+_worker = {}
+
+
+def _init_worker(font_path, config):
+    # Loaded once per worker process, jobs only carry paths and text
+    _worker["font_path"] = font_path
+    _worker["config"] = config
+    if font_path and os.path.exists(font_path):
+        get_registry().register_path(font_path)
+
+
+def _ping(_):
+    return os.getpid()
+
+
+def _render_job(job):
+    return render_slide_to_file(*job, font_path=_worker["font_path"], config=_worker["config"])
+
+
+def _render_job_bytes(job):
+    return render_slide_to_bytes(*job, font_path=_worker["font_path"], config=_worker["config"])
+
+
+class RenderPool:
+    """
+    Process pool that renders slides on every core. Workers receive (index, image_path,
+    text, font_color, output_path_or_name, phone_boxes, layout) jobs and produce the same
+    JPEG bytes serial rendering does, either written to disk or sent back.
+    """
+
+    def __init__(self, font_path, config, workers=None):
+        self.font_path = font_path
+        self.workers = workers or os.cpu_count() or 1
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(font_path, config)
+        )
+        # Start every worker now, before the pipeline's threads exist
+        list(self._pool.map(_ping, range(self.workers)))
+
+    def render(self, jobs):
+        """Render jobs in parallel, returning output paths in job order (None where a slide was skipped)."""
+        return list(self._pool.map(_render_job, jobs))
+
+    def render_bytes(self, jobs):
+        """Render jobs in parallel, returning (name, jpeg_bytes) in job order (None where a slide was skipped)."""
+        return list(self._pool.map(_render_job_bytes, jobs))
+
+    def close(self):
+        self._pool.shutdown(wait=True)
@@ -1,11 +1,149 @@
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
+import csv
+import hashlib
+import json
+import os
+import re
 
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+from modules import google_clients
+from modules.fake_api import with_faults
+from modules.utils import retry_transient
+
+SHEET_STATE_PATH = os.path.join("cache", "sheet_state.json")
 
 def get_sheet_data(sheet_id, sheet_range):
-    creds = Credentials.from_service_account_file('credentials.json', scopes=SCOPES)
-    service = build('sheets', 'v4', credentials=creds)
+    service = google_clients.sheets()
     sheet = service.spreadsheets()
-    result = sheet.values().get(spreadsheetId=sheet_id, range=sheet_range).execute()
+    request = sheet.values().get(spreadsheetId=sheet_id, range=sheet_range)
+    result = retry_transient(request.execute, api="sheets")
     return result.get('values', [])
+
+
+def column_index(letters):
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + ord(char) - ord('A') + 1
+    return index - 1
+
+
+def parse_a1(range_name):
+    """'Sheet1!A2:Q' -> ('Sheet1', first_row, first_col, last_row, last_col), 0-based, None for open ends."""
+    sheet, _, cells = range_name.partition('!')
+    if not cells:
+        return sheet, 0, 0, None, None
+
+    def corner(ref):
+        match = re.fullmatch(r"([A-Za-z]*)(\d*)", ref)
+        letters, digits = match.groups()
+        return (int(digits) - 1 if digits else None), (column_index(letters) if letters else None)
+
+    start, _, end = cells.partition(':')
+    first_row, first_col = corner(start)
+    last_row, last_col = corner(end) if end else (first_row, first_col)
+    return sheet, first_row or 0, first_col or 0, last_row, last_col
+
+
+def trim_values(values):
+    """Drop trailing empty cells and rows, like the Sheets API does."""
+    rows = []
+    for row in values:
+        row = list(row)
+        while row and row[-1] in ("", None):
+            row.pop()
+        rows.append(row)
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+class GoogleSheetsBackend:
+    def batch_get(self, spreadsheet_id, ranges):
+        request = google_clients.sheets().spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=ranges
+        )
+        result = retry_transient(request.execute, api="sheets")
+        return [value_range.get('values', []) for value_range in result.get('valueRanges', [])]
+
+
+class LocalSheetsBackend:
+    """
+    Stand-in for Sheets. A spreadsheet is either <root>/<spreadsheet_id>.json mapping
+    sheet names to lists of rows, or a <root>/<spreadsheet_id>/ directory of <sheet name>.csv files.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _sheet(self, spreadsheet_id, sheet):
+        json_path = os.path.join(self.root, f"{spreadsheet_id}.json")
+        if os.path.exists(json_path):
+            with open(json_path, "r", encoding="utf-8") as f:
+                return json.load(f).get(sheet, [])
+        csv_path = os.path.join(self.root, spreadsheet_id, f"{sheet}.csv")
+        if not os.path.exists(csv_path):
+            return []
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            return list(csv.reader(f))
+
+    def batch_get(self, spreadsheet_id, ranges):
+        results = []
+        for range_name in ranges:
+            sheet, first_row, first_col, last_row, last_col = parse_a1(range_name)
+            rows = self._sheet(spreadsheet_id, sheet)
+            rows = rows[first_row:None if last_row is None else last_row + 1]
+            rows = [row[first_col:None if last_col is None else last_col + 1] for row in rows]
+            results.append(trim_values(rows))
+        return results
+
+
+def make_sheets_backend(config):
+    local_root = config.get("local_sheets_root")
+    if local_root:
+        return with_faults(LocalSheetsBackend(local_root), "sheets", config)
+    return GoogleSheetsBackend()
+
+
+class SheetSnapshot:
+    """Prompt cell and data rows of one spreadsheet, read together in a single batchGet and held for the run."""
+
+    def __init__(self, spreadsheet_id, prompt, rows):
+        self.spreadsheet_id = spreadsheet_id
+        self.prompt = prompt
+        self.rows = rows
+
+    @classmethod
+    def load(cls, backend, spreadsheet_id, prompt_range, data_range):
+        prompt_values, data_values = backend.batch_get(spreadsheet_id, [prompt_range, data_range])
+        if not prompt_values or not prompt_values[0]:
+            raise ValueError("❌ Prompt cell is empty or missing.")
+        # Skip the header row
+        return cls(spreadsheet_id, prompt_values[0][0], data_values[1:] if data_values else [])
+
+    def row_hash(self, row):
+        # The prompt is part of the hash so editing it regenerates every row
+        payload = json.dumps({"prompt": self.prompt, "row": [cell.strip() for cell in row]}, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SheetState:
+    """Hashes of rows already turned into carousels, persisted between runs."""
+
+    def __init__(self, path=SHEET_STATE_PATH):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.done = {sheet: set(hashes) for sheet, hashes in json.load(f).items()}
+
+    def is_done(self, spreadsheet_id, row_hash):
+        return row_hash in self.done.get(spreadsheet_id, set())
+
+    def mark_done(self, spreadsheet_id, row_hash):
+        self.done.setdefault(spreadsheet_id, set()).add(row_hash)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({sheet: sorted(hashes) for sheet, hashes in self.done.items()}, f)
+        os.replace(tmp_path, self.path)
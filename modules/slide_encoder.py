@@ -0,0 +1,29 @@
+import io
+
+# Pillow JPEG save options. "default" is what slides have always been saved with.
+ENCODER_PRESETS = {
+    "default": {"quality": 95},
+    "max": {"quality": 95, "optimize": True, "progressive": True, "subsampling": "4:4:4"},
+    "balanced": {"quality": 90, "optimize": True, "progressive": True, "subsampling": "4:2:0"},
+    "small": {"quality": 82, "optimize": True, "progressive": True, "subsampling": "4:2:0"},
+    "fast": {"quality": 90, "subsampling": "4:2:0"},
+}
+
+
+def preset_options(preset):
+    if isinstance(preset, dict):
+        return preset
+    if preset not in ENCODER_PRESETS:
+        raise ValueError(f"Unknown encoder preset {preset!r}, expected one of {sorted(ENCODER_PRESETS)}")
+    return ENCODER_PRESETS[preset]
+
+
+def save_slide(img, fp, preset="default"):
+    """Write an RGB slide as JPEG to a path or file object."""
+    img.save(fp, "JPEG", **preset_options(preset))
+
+
+def encode_slide(img, preset="default"):
+    buffer = io.BytesIO()
+    save_slide(img, buffer, preset)
+    return buffer.getvalue()
@@ -0,0 +1,176 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+
+from PIL import ImageFont
+
+from modules.font_registry import get_registry
+
+
+class FontMetrics:
+    """
+    Per-font cache of word advances and line heights. Fonts themselves come from the
+    registry's LRU, and at most max_widths word advances are kept, least recently used first out.
+    """
+
+    def __init__(self, font_path, registry=None, max_widths=20000):
+        self.font_path = font_path
+        self.registry = registry or get_registry()
+        self.max_widths = max_widths
+        self._widths = OrderedDict()
+        self._line_heights = {}
+        self._lock = threading.Lock()
+
+    def font(self, size):
+        return self.registry.font(self.font_path, size)
+
+    def width(self, word, size):
+        key = (size, word)
+        with self._lock:
+            width = self._widths.get(key)
+            if width is not None:
+                self._widths.move_to_end(key)
+                return width
+        width = self.font(size).getlength(word)
+        with self._lock:
+            self._widths[key] = width
+            if len(self._widths) > self.max_widths:
+                self._widths.popitem(last=False)
+        return width
+
+    def space_width(self, size):
+        return self.width(" ", size)
+
+    def line_height(self, size):
+        height = self._line_heights.get(size)
+        if height is None:
+            bbox = self.font(size).getbbox("Ay")
+            height = bbox[3] - bbox[1]
+            self._line_heights[size] = height
+        return height
+
+
+_metrics = {}
+
+
+def get_metrics(font_path):
+    metrics = _metrics.get(font_path)
+    if metrics is None:
+        metrics = FontMetrics(font_path)
+        _metrics[font_path] = metrics
+    return metrics
+
+
+@dataclass
+class TextLayout:
+    font_size: int
+    font: ImageFont.FreeTypeFont
+    lines: list
+    positions: list
+    line_height: int
+    total_height: int
+    fits: bool
+    widths: list = field(default_factory=list)
+
+    def placements(self):
+        return list(zip(self.positions, self.lines))
+
+    def moved_to(self, top):
+        """Same lines and size with the block starting at y=top."""
+        if not self.positions:
+            return self
+        dy = top - self.positions[0][1]
+        return replace(self, positions=[(x, y + dy) for x, y in self.positions])
+
+    def block_box(self):
+        if not self.positions:
+            return None
+        left = min(x for x, _ in self.positions)
+        right = max(x + w for (x, _), w in zip(self.positions, self.widths))
+        top = self.positions[0][1]
+        bottom = self.positions[-1][1] + self.line_height
+        return (left, top, right, bottom)
+
+
+def wrap_words(words, metrics, size, max_width):
+    """Greedy wrap that sums cached advances instead of re-measuring each growing line."""
+    space = metrics.space_width(size)
+    lines = []
+    current = []
+    current_width = 0
+    for word in words:
+        word_width = metrics.width(word, size)
+        candidate = current_width + space + word_width if current else word_width
+        if current and candidate > max_width:
+            lines.append(" ".join(current))
+            current = [word]
+            current_width = word_width
+        else:
+            current.append(word)
+            current_width = candidate
+    if current:
+        lines.append(" ".join(current))
+    return lines
+
+
+def block_height(lines, metrics, size, line_spacing):
+    return len(lines) * (metrics.line_height(size) + line_spacing)
+
+
+def fit_text(text, font_path, safe_box, start_size, min_size=60, step=2, fit_line_spacing=10, line_spacing=20, top=None):
+    """
+    Binary search the largest size (start_size, start_size - step, ..., min_size) whose
+    wrapped text fits the safe box, then centre each line horizontally in it.
+
+    The block is centred vertically unless `top` is given.
+    """
+    metrics = get_metrics(font_path)
+    safe_left, safe_top, safe_right, safe_bottom = safe_box
+    max_width = safe_right - safe_left
+    max_height = safe_bottom - safe_top
+    words = text.split()
+
+    sizes = list(range(start_size, min_size, -step)) + [min_size]
+
+    def fits(size):
+        lines = wrap_words(words, metrics, size, max_width)
+        return block_height(lines, metrics, size, fit_line_spacing) <= max_height
+
+    # sizes are descending, so "fits" flips from False to True at most once
+    lo, hi = 0, len(sizes) - 1
+    if fits(sizes[hi]):
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if fits(sizes[mid]):
+                hi = mid
+            else:
+                lo = mid + 1
+        chosen, fitted = sizes[lo], True
+    else:
+        chosen, fitted = min_size, False
+
+    font = metrics.font(chosen)
+    lines = wrap_words(words, metrics, chosen, max_width)
+    line_height = metrics.line_height(chosen)
+    total_height = block_height(lines, metrics, chosen, fit_line_spacing)
+
+    y = top if top is not None else max(safe_top, (safe_top + safe_bottom - total_height) // 2)
+    positions = []
+    widths = []
+    for line in lines:
+        bbox = font.getbbox(line)
+        line_width = bbox[2] - bbox[0]
+        positions.append((safe_left + (max_width - line_width) // 2, y))
+        widths.append(line_width)
+        y += line_height + line_spacing
+
+    return TextLayout(
+        font_size=chosen,
+        font=font,
+        lines=lines,
+        positions=positions,
+        line_height=line_height,
+        total_height=total_height,
+        fits=fitted,
+        widths=widths,
+    )
@@ -0,0 +1,34 @@
+from modules.rate_limiter import get_scheduler
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def error_status(exc):
+    """HTTP status of a googleapiclient HttpError or an openai APIStatusError, if any."""
+    resp = getattr(exc, "resp", None)
+    status = getattr(resp, "status", None) if resp is not None else getattr(exc, "status_code", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+RETRYABLE_ERROR_NAMES = {"APIConnectionError"}
+
+
+def is_transient_error(exc):
+    status = error_status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    # openai's connection errors and its APITimeoutError subclass, matched by name so openai is never imported here
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(exc).__mro__)
+
+
+def retry_transient(fn, attempts=4, base_delay=0.5, max_delay=8.0, api=None):
+    """
+    Call fn(), retrying transient errors with jittered exponential backoff. Other errors raise at once.
+    With api ("drive", "sheets", "openai") the call also waits its turn on that API's rate limiter.
+    """
+    return get_scheduler().call(api, fn, attempts=attempts, base_delay=base_delay, max_delay=max_delay)
@@ -0,0 +1,164 @@
+import atexit
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+WORKSPACE_ROOT = os.path.join("temp", "workspaces")
+OWNER_FILE = "owner.pid"
+
+
+def dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class Workspace:
+    """
+    Scratch space for one run: <root>/run_<ts>_<pid>/<job>/. Point root at a tmpfs
+    (e.g. /dev/shm/carousels) to keep scratch files off the disk.
+
+    Jobs are released when they finish and removed unless keep_finished is set; kept
+    jobs are evicted oldest first once they pass max_age_seconds or the run goes over
+    quota_bytes. Run directories left behind by crashed processes are swept on start
+    and the run directory itself is removed on close() or interpreter exit.
+    Only directories under root are ever touched.
+    """
+
+    def __init__(self, root=WORKSPACE_ROOT, quota_bytes=2 * 1024 ** 3, max_age_seconds=24 * 3600, keep_finished=False):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.max_age_seconds = max_age_seconds
+        self.keep_finished = keep_finished
+        self.bytes_written = 0
+        self.bytes_freed = 0
+        self.evicted = 0
+        self._active = set()
+        self._finished = {}  # path -> (released_at, size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.run_dir = os.path.join(root, f"run_{timestamp}_{os.getpid()}")
+        os.makedirs(self.run_dir)
+        with open(os.path.join(self.run_dir, OWNER_FILE), "w") as f:
+            f.write(str(os.getpid()))
+        atexit.register(self.close)
+
+    def _remove(self, path):
+        size = dir_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+        self.bytes_freed += size
+        return size
+
+    def sweep(self):
+        """Remove run directories whose process is gone, returning bytes freed."""
+        freed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if path == self.run_dir or not name.startswith("run_") or not os.path.isdir(path):
+                continue
+            try:
+                with open(os.path.join(path, OWNER_FILE), "r") as f:
+                    owner = int(f.read().strip())
+            except (OSError, ValueError):
+                owner = None
+            if owner is not None and pid_alive(owner):
+                continue
+            with self._lock:
+                freed += self._remove(path)
+            print(f"🧹 Removed stale workspace {path}")
+        return freed
+
+    def allocate(self, name):
+        """A fresh directory for one job, held until release()."""
+        path = os.path.join(self.run_dir, name)
+        os.makedirs(path)
+        with self._lock:
+            self._active.add(path)
+        self.enforce_quota()
+        return path
+
+    def release(self, path, keep=None):
+        keep = self.keep_finished if keep is None else keep
+        size = dir_size(path)
+        with self._lock:
+            self._active.discard(path)
+            self.bytes_written += size
+            if keep:
+                self._finished[path] = (time.time(), size)
+            else:
+                self._remove(path)
+        if keep:
+            self.enforce_quota()
+
+    @contextmanager
+    def job(self, name, keep=None):
+        """Directory for the duration of a with block, released even if the block raises."""
+        path = self.allocate(name)
+        try:
+            yield path
+        finally:
+            self.release(path, keep)
+
+    def enforce_quota(self):
+        """Evict kept jobs past max age, then oldest first until the run fits quota_bytes."""
+        with self._lock:
+            now = time.time()
+            for path, (released_at, _) in sorted(self._finished.items(), key=lambda item: item[1][0]):
+                if now - released_at > self.max_age_seconds:
+                    self._remove(path)
+                    del self._finished[path]
+                    self.evicted += 1
+
+            used = sum(size for _, size in self._finished.values())
+            used += sum(dir_size(path) for path in self._active)
+            for path, (_, size) in sorted(self._finished.items(), key=lambda item: item[1][0]):
+                if used <= self.quota_bytes:
+                    break
+                self._remove(path)
+                del self._finished[path]
+                self.evicted += 1
+                used -= size
+            if used > self.quota_bytes:
+                print(f"⚠️ Workspace over quota: {used} bytes in use by active jobs (quota {self.quota_bytes})")
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for path in self._active:
+                self.bytes_written += dir_size(path)
+            self._active.clear()
+            self._finished.clear()
+            if os.path.exists(self.run_dir):
+                self._remove(self.run_dir)
+
+    def stats(self):
+        return {
+            "bytes_written": self.bytes_written,
+            "bytes_freed": self.bytes_freed,
+            "evicted": self.evicted,
+            "active_jobs": len(self._active),
+        }